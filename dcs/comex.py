@@ -0,0 +1,146 @@
+from pandas import concat, DataFrame
+import pyarrow.dataset as ds, pyarrow.parquet as pq
+import os, dcs24
+
+# flow-dependent columns of the import/export tables
+FLOWS = {'imp': {'country': 'País de origem', 'uf': 'UF de destino'},
+         'exp': {'country': 'País de destino', 'uf': 'UF de origem'}}
+
+# descriptive columns resolved from the country/via code tables after aggregation
+NAMES = {'Nome do país': 'country', 'Nome do bloco': 'country', 'Descrição da via': 'via'}
+
+# rows per scanned batch
+BATCH_SIZE = 1_000_000
+
+
+def _as_list(x):
+    """Wrap scalars into a list."""
+
+    return list(x) if isinstance(x, (list, tuple, set, range)) else [x]
+
+
+def _codes(values, table, code, name):
+    """Translate names (or pass codes through) to integer codes of a code table."""
+
+    codes = set()
+    for v in _as_list(values):
+        if isinstance(v, str):
+            found = table.loc[table[name] == v, code]
+            if found.empty:
+                raise ValueError(f'Unknown value for {name}: {v}')
+            codes.update(found.tolist())
+        else:
+            codes.add(int(v))
+
+    return sorted(codes)
+
+
+def _expression(filters: dict, cols: dict, cc, via):
+    """Build the pyarrow filter expression pushed down into the file scan."""
+
+    expr = None
+    for key, values in (filters or {}).items():
+
+        if key == 'country':
+            field, values = cols['country'], _codes(values, cc, 'Código do país', 'Nome do país')
+        elif key == 'block':
+            field, values = cols['country'], _codes(values, cc, 'Código do país', 'Nome do bloco')
+        elif key == 'via':
+            field, values = 'Meio de transporte', _codes(values, via, 'Código da via', 'Descrição da via')
+        elif key == 'uf':
+            field, values = cols['uf'], _as_list(values)
+        elif key == 'month':
+            field, values = 'Mês', _as_list(values)
+        elif key == 'ncm':
+            field, values = 'NCM', _as_list(values)
+        else:
+            raise ValueError(f'Possible filters are: country, block, via, uf, month, ncm. Got: {key}')
+
+        e = ds.field(field).isin(values)
+        expr = e if expr is None else expr & e
+
+    return expr
+
+
+def _merge(acc, partial, keys):
+    """Combine running aggregate with a new partial aggregate."""
+
+    if acc is None:
+        return partial
+    if not keys:
+        return acc + partial
+
+    return concat([acc, partial]).groupby(level=keys, observed=True).sum()
+
+
+def query(years, flow='imp', filters=None, group_by=None, metrics=None, batch_size=BATCH_SIZE):
+    """Aggregate COMEX trade data over one or more years without loading the raw rows.
+
+    years: year or iterable of years.
+    flow: 'imp' (imports) or 'exp' (exports).
+    filters: dict with keys 'country' (names or codes), 'block' (names), 'via' (descriptions or codes),
+             'uf', 'month' and 'ncm'. Values are scalars or lists. Filters are pushed down into the
+             Parquet scan, so row groups that cannot match are never read.
+    group_by: list of columns of the trade table (e.g. 'Ano', 'Mês', 'NCM') and/or
+              'Nome do país', 'Nome do bloco', 'Descrição da via'.
+    metrics: list of columns to sum (default: ['Valor Free On Board']).
+
+    Example: query(range(2015,2021), 'imp', filters={'block': 'Mercosul', 'via': 'AEREA'},
+                   group_by=['Ano','Nome do país'])
+
+    Countries belonging to several blocks contribute to each of them when grouping by 'Nome do bloco'.
+    """
+
+    if flow not in FLOWS:
+        raise ValueError(f"Possible flows are: 'imp', 'exp'. Got: {flow}")
+
+    cols = FLOWS[flow]
+    group_by = _as_list(group_by) if group_by is not None else []
+    metrics = _as_list(metrics) if metrics is not None else ['Valor Free On Board']
+
+    # raw grouping keys: descriptive names are grouped by their codes and resolved at the end
+    raw = {'country': cols['country'], 'via': 'Meio de transporte'}
+    keys = list(dict.fromkeys(raw[NAMES[g]] if g in NAMES else g for g in group_by))
+
+    # years with neither Parquet nor CSV cache are fetched concurrently before scanning
+    years = _as_list(years)
+    cached = lambda y: dcs24.is_cached(dcs24.comex_dir(y)) or os.path.isfile(os.path.join(dcs24.comex_dir(y), dcs24.TABLES['imp'][0]))
+    missing = [y for y in years if not cached(y)]
+    if missing:
+        dcs24.download_years(missing)
+
+    acc, cc, via = None, None, None
+    for year in years:
+
+        files = dcs24.cache_files(year)
+        cc = dcs24.set_dtypes(pq.read_table(files['cc']).to_pandas())
+        via = dcs24.set_dtypes(pq.read_table(files['via']).to_pandas())
+
+        scan = ds.dataset(files[flow], format='parquet').to_batches(columns=keys + metrics,
+                                                                     filter=_expression(filters, cols, cc, via),
+                                                                     batch_size=batch_size)
+        for batch in scan:
+            if batch.num_rows == 0:
+                continue
+            df = batch.to_pandas()
+            partial = df.groupby(keys, observed=True)[metrics].sum() if keys else df[metrics].sum()
+            acc = _merge(acc, partial, keys)
+
+    if acc is None:
+        return DataFrame(columns=group_by + metrics)
+
+    if not keys:
+        return acc.to_frame().T.reset_index(drop=True)
+
+    # resolve codes into names with the code tables of the last year read
+    out = acc.reset_index()
+    for g in group_by:
+        if g in NAMES:
+            if NAMES[g] == 'country':
+                table = cc[['Código do país', g]].drop_duplicates().rename(columns={'Código do país': raw['country']})
+            else:
+                table = via.rename(columns={'Código da via': raw['via']})
+            out[raw[NAMES[g]]] = out[raw[NAMES[g]]].astype('int64')
+            out = out.merge(table.astype({raw[NAMES[g]]: 'int64'}), on=raw[NAMES[g]])
+
+    return out.groupby(group_by, observed=True)[metrics].sum().reset_index()
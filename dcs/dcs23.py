@@ -0,0 +1,101 @@
+from pandas import read_parquet, concat, DataFrame, to_numeric
+import numpy as np
+import geodata, sheets, os, unicodedata
+
+# ANP public wells spreadsheets
+WELLS = os.path.join(geodata.DATA, 'ANP_pocos_publicos', 'planilha-pocos-publicos-{year}.xlsx')
+
+# joins of wells to polygon layers, one file per (wells file, layer) pair
+JOIN_DIR = os.path.join(geodata.CACHE_DIR, 'joins')
+
+# (longitude, latitude) columns in decimal degrees; the layout changes across years
+COORDINATES = [('LONGITUDE1', 'LATITUDE_1'), ('LONGITUDE_BASE_DD', 'LATITUDE_BASE_DD')]
+
+# layer attributes attached to each well: layer -> {layer column: well column}
+ATTRIBUTES = {'campos': {'NOM_CAMPO': 'CAMPO_GEO', 'SIG_CAMPO': 'SIG_CAMPO_GEO', 'NOM_BACIA': 'BACIA_GEO'},
+              'estados': {'NAME_1': 'ESTADO_GEO'}}
+
+
+def degrees(s):
+    """Decimal degrees of a coordinate column (text columns use decimal commas); bad values become NaN."""
+
+    if s.dtype.kind in 'fiu':
+        return s.to_numpy(float)
+
+    return to_numeric(s.astype(str).str.replace(',', '.', regex=False), errors='coerce').to_numpy(float)
+
+
+def coordinates(df):
+    """(longitude, latitude) arrays of the wells."""
+
+    for lon, lat in COORDINATES:
+        if lon in df and lat in df:
+            return degrees(df[lon]), degrees(df[lat])
+
+    raise ValueError(f'No coordinate columns in the wells table. Expected one of: {COORDINATES}')
+
+
+def normalize(names):
+    """Names comparable across sources: no accents, upper case, single spaces."""
+
+    strip = lambda s: ''.join(c for c in unicodedata.normalize('NFKD', s) if not unicodedata.combining(c))
+
+    return names.fillna('').astype(str).map(strip).str.upper().str.split().str.join(' ')
+
+
+def join_layer(df, layer, wells_hash=None):
+    """
+    Attributes (ATTRIBUTES[layer]) of the polygon of layer containing each well; NaN outside
+    every polygon. With wells_hash (hash of the file df was read from), the result is cached
+    per (wells file, layer source) and reused while neither changes.
+    """
+
+    cache = None
+    if wells_hash:
+        cache = os.path.join(JOIN_DIR, f'{wells_hash[:16]}-{layer}-{geodata.fingerprint(layer)[:16]}.parquet')
+        if os.path.isfile(cache):
+            return read_parquet(cache).set_axis(df.index)
+
+    attrs = ATTRIBUTES[layer]
+    polygons = geodata.tree(layer)[0]
+    row = geodata.locate(layer, *coordinates(df))
+    found = row >= 0
+    out = DataFrame({new: np.where(found, polygons[col].to_numpy(object)[row], None)
+                     for col, new in attrs.items()}, index=df.index)
+
+    if cache:
+        os.makedirs(JOIN_DIR, exist_ok=True)
+        out.reset_index(drop=True).to_parquet(cache + '.part', index=False)
+        os.replace(cache + '.part', cache)
+
+    return out
+
+
+def join_wells(df, layers=('campos', 'estados'), wells_hash=None):
+    """
+    Wells with the attributes of the field and state polygons that contain them.
+
+    CAMPO_OK tells whether the field named in the spreadsheet (CAMPO) is the field the well
+    lies in; wells whose name differs (spelling, accents, renamed fields) are kept, not dropped.
+    """
+
+    out = concat([df] + [join_layer(df, layer, wells_hash) for layer in layers], axis=1)
+    if 'campos' in layers and 'CAMPO' in df:
+        out['CAMPO_OK'] = normalize(out['CAMPO']).eq(normalize(out['CAMPO_GEO'])) # both empty: exploratory well outside fields
+
+    return out
+
+
+def load_wells(year: int, layers=('campos', 'estados')):
+    """ANP public wells of a year joined to the polygon layers (sheet and joins cached by file hash)."""
+
+    path = WELLS.format(year=year)
+    df = sheets.read_xlsx(path)
+
+    return join_wells(df, layers, sheets.digest(path))
+
+
+def mismatches(df):
+    """Wells whose CAMPO is not the field polygon they lie in (named wells outside fields, wells inside unnamed fields)."""
+
+    return df.loc[~df['CAMPO_OK'], [c for c in ('POCO', 'CAMPO', 'CAMPO_GEO', 'ESTADO', 'ESTADO_GEO') if c in df]]
@@ -1,82 +1,441 @@
 from pandas import read_csv
-import io, os, requests
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+import pyarrow as pa, pyarrow.compute as pc, pyarrow.parquet as pq
+import os, shutil, requests
 from warnings import filterwarnings
 
 # remove warning launched by requests
 filterwarnings("ignore")
 
-def load_files(year: int,path: str):
-    """Simple function to load import/export files"""
+# cache version: increase whenever names, dtypes or layout of the cached tables change
+CACHE_VERSION = '1'
+CACHE_KEY = b'dcs24.cache_version'
+
+# rows per Parquet row group (unit of selective reading)
+ROW_GROUP_SIZE = 250_000
+
+# rows per CSV chunk when streaming downloads into the cache
+CHUNK_SIZE = 250_000
+
+# COMEX database
+ROOT = 'https://balanca.economia.gov.br/balanca/bd/'
+
+# concurrent downloads and download block size (bytes)
+MAX_WORKERS = 4
+BLOCK_SIZE = 1 << 20
+
+# cached tables: name -> (CSV file, Parquet file)
+TABLES = {'imp': ('imports.csv', 'imports.parquet'),
+          'exp': ('exports.csv', 'exports.parquet'),
+          'cc': ('country-codes.csv', 'country-codes.parquet'),
+          'via': ('via-codes.csv', 'via-codes.parquet')}
+
+# column names
+IMP_COLUMNS = ['Ano','Mês','NCM','Unidade estatística','País de origem','UF de destino',
+               'Meio de transporte','URF desembarque','Quantidade estatística','Kg líquido',
+               'Valor Free On Board','Valor de frete','Valor de seguro']
+
+EXP_COLUMNS = ['Ano','Mês','NCM','Unidade estatística','País de destino','UF de origem',
+               'Meio de transporte','URF embarque','Quantidade estatística','Kg líquido',
+               'Valor Free On Board','Valor de frete','Valor de seguro']
+
+CC_COLUMNS = ['Código do país','Nome do país','Nome do bloco']
+
+VIA_COLUMNS = ['Código da via','Descrição da via']
+
+# explicit dtypes: categoricals for UF, país and via; integer codes for the rest
+DTYPES = {'Ano': 'int16', 'Mês': 'int8', 'NCM': 'int32', 'Unidade estatística': 'int16',
+          'País de origem': 'category', 'País de destino': 'category',
+          'UF de destino': 'category', 'UF de origem': 'category',
+          'Meio de transporte': 'category',
+          'URF desembarque': 'int32', 'URF embarque': 'int32',
+          'Quantidade estatística': 'int64', 'Kg líquido': 'int64',
+          'Valor Free On Board': 'int64', 'Valor de frete': 'int64', 'Valor de seguro': 'int64',
+          'Código do país': 'int16', 'Nome do país': 'category', 'Nome do bloco': 'category',
+          'Código da via': 'int8', 'Descrição da via': 'category'}
+
+# value types of the categorical columns in the cache: codes as in the raw files, names as text
+CATEGORY_VALUES = {'País de origem': pa.int64(), 'País de destino': pa.int64(), 'Meio de transporte': pa.int64()}
+
+# sort keys for trade tables so that row group statistics can prune by month/state
+SORT_KEYS = {'imp': ['Mês','UF de destino'], 'exp': ['Mês','UF de origem']}
+
+
+def set_dtypes(df):
+    """Cast known columns to their cache dtypes."""
+
+    return df.astype({k: v for k, v in DTYPES.items() if k in df.columns})
+
+
+def schema(columns):
+    """Arrow schema of the cache columns.
+
+    Widths are fixed by DTYPES, not inferred: categoricals get int32 dictionary indices, so chunks
+    (and years) with any number of categories share one schema.
+    """
+
+    def arrow_type(column):
+        if DTYPES[column] == 'category':
+            return pa.dictionary(pa.int32(), CATEGORY_VALUES.get(column, pa.string()))
+        return pa.from_numpy_dtype(DTYPES[column])
+
+    return pa.schema([(c, arrow_type(c)) for c in columns], metadata={CACHE_KEY: CACHE_VERSION.encode()})
+
+
+def to_table(df, target):
+    """Typed dataframe as an Arrow table of the target schema."""
+
+    return pa.Table.from_pandas(df[target.names], preserve_index=False).cast(target)
+
+
+def write_table(df, file: str, sort_by=None):
+    """Write typed dataframe to a versioned Parquet file."""
+
+    df = set_dtypes(df)
+    if sort_by:
+        df = df.sort_values(sort_by, ignore_index=True)
+
+    table = to_table(df, schema(df.columns))
+
+    # write to temporary file first so that an interrupted write never looks like a valid cache
+    tmp = file + '.part'
+    pq.write_table(table, tmp, row_group_size=ROW_GROUP_SIZE)
+    os.replace(tmp, file)
+
+
+def is_cached(path: str):
+    """Check whether all tables in path are in the current Parquet cache version."""
+
+    for _, pqt in TABLES.values():
+        file = os.path.join(path, pqt)
+        if not os.path.isfile(file):
+            return False
+        metadata = pq.read_schema(file).metadata or {}
+        if metadata.get(CACHE_KEY) != CACHE_VERSION.encode():
+            return False
+
+    return True
+
+
+def migrate_csv(path: str):
+    """One-time conversion of a CSV cache (older layout) into the Parquet cache."""
+
+    for name, (csv, pqt) in TABLES.items():
+        df = read_csv(os.path.join(path, csv))
+        write_table(df, os.path.join(path, pqt), SORT_KEYS.get(name))
+
+    print(f'COMEX CSV files migrated to Parquet in: {path}')
+
+
+def _flow(arg, name: str):
+    """Argument of one flow: arg[name] if arg is a dict keyed by 'imp'/'exp', else arg itself."""
+
+    return arg.get(name) if isinstance(arg, dict) else arg
+
+
+def load_files(year: int, path: str, columns=None, filters=None):
+    """Simple function to load import/export files.
+
+    columns: list of columns to read from both import/export tables (default: all), or a dict
+             keyed by 'imp'/'exp' for columns of one flow only, e.g. {'imp': ['Mês','País de origem'],
+             'exp': ['Mês','País de destino']}. A flow left out of the dict is read whole.
+    filters: pyarrow filters applied to the import/export tables, e.g. [('Mês','<=',6)], or a dict
+             keyed by 'imp'/'exp' like columns. Only the row groups that can match are read from disk.
+    """
+
+    if not is_cached(path):
+        if not all(os.path.isfile(os.path.join(path, csv)) for csv, _ in TABLES.values()):
+            raise FileNotFoundError(f'COMEX cache not found in: {path}')
+        migrate_csv(path)
+
+    # integer categoricals are stored as plain integers by Parquet; dtypes are restored on read
+    read = lambda name, **kw: set_dtypes(pq.read_table(os.path.join(path, TABLES[name][1]), **kw).to_pandas())
+
+    imp = read('imp', columns=_flow(columns, 'imp'), filters=_flow(filters, 'imp'))
+    exp = read('exp', columns=_flow(columns, 'exp'), filters=_flow(filters, 'exp'))
+    cc = read('cc')
+    via = read('via')
 
-    imp = read_csv(os.path.join(path,'imports.csv'))
-    exp = read_csv(os.path.join(path,'exports.csv'))
-    cc = read_csv(os.path.join(path,'country-codes.csv'))
-    via = read_csv(os.path.join(path,'via-codes.csv'))
-    
     print(f'COMEX files successfuly loaded from: {path}')
-    
+
     return imp, exp, cc, via, path
 
-def get_comex(year: int):
-    """Try to load pre-stored foreign trade (COMEXStats) files. Otherwise, pull from MDIC.GOV.BR"""
 
-    target_dir = '../data/comex-' + str(year)
+def comex_dir(year: int):
+    """Cache directory for a given year."""
 
-    try:
+    return '../data/comex-' + str(year)
+
+
+def session(max_workers=MAX_WORKERS):
+    """Pooled HTTP session with retries and exponential backoff."""
+
+    retry = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504])
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry)
+
+    s = requests.Session()
+    s.verify = False # SSL verification not necessary for this class example
+    s.mount('http://', adapter)
+    s.mount('https://', adapter)
+
+    return s
+
+
+def remote_size(r):
+    """Size of the whole remote file from a response (Content-Range, or Content-Length of a plain 200), or None."""
+
+    if 'Content-Range' in r.headers:
+        total = r.headers['Content-Range'].rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else None
+    if r.status_code == 200 and 'Content-Length' in r.headers and 'Content-Encoding' not in r.headers:
+        return int(r.headers['Content-Length'])
+
+    return None
+
+
+def fetch(s, url: str, file: str, attempts=5):
+    """Download url to file, resuming partial downloads.
+
+    Data is written to file + '.part' and renamed to file only when complete, i.e. when its size
+    matches the remote size (whenever the server tells it). The ETag of a partial download is kept
+    in file + '.etag' and sent with If-Range, so a changed remote file restarts from scratch instead
+    of being spliced. A partial file that does not match the remote size is discarded.
+    """
+
+    if os.path.isfile(file):
+        return file
+
+    part, tag = file + '.part', file + '.etag'
 
-        # pre-stored files
-        imp, exp, cc, via, target_dir = load_files(year,target_dir)
-
-    except:
-        
-        print(f'COMEX files unavailable for year {year}. Trying to download from GOV.BR...')
-
-        # URLs
-        root = 'https://balanca.economia.gov.br/balanca/bd/'
-        imp = 'comexstat-bd/ncm/' + 'IMP_' + str(year) + '.csv' # imports
-        exp = 'comexstat-bd/ncm/' + 'EXP_' + str(year) + '.csv' # exports
-        bc = 'tabelas/PAIS_BLOCO.csv' # block codes
-        cc = 'tabelas/PAIS.csv' # country codes
-        via = 'tabelas/VIA.csv' # transport vias
-
-        # SSL verification not necessary for this class example
-        trade = lambda x: read_csv(io.StringIO(requests.get(root + x,verify=False).content.decode('utf-8')),sep=';')
-        imp, exp = trade(imp), trade(exp)
-
-        # country/block codes
-        bc = read_csv(io.StringIO(requests.get(root + bc,verify=False).content.decode('ISO-8859-1')), sep =';', usecols = [0,2])
-        cc = read_csv(io.StringIO(requests.get(root + cc,verify=False).content.decode('ISO-8859-1')), sep =';', usecols = [0,3])
-        cc = cc.merge(bc, on = 'CO_PAIS')
-        
-        # transport vias
-        via = read_csv(io.StringIO(requests.get(root + via,verify=False).content.decode('ISO-8859-1')), sep =';')
-
-        # rename
-        imp = imp.rename(columns=dict(zip(imp.keys(),
-        ['Ano','Mês','NCM','Unidade estatística','País de origem','UF de destino',
-        'Meio de transporte','URF desembarque','Quantidade estatística','Kg líquido',
-        'Valor Free On Board','Valor de frete','Valor de seguro'])))
-
-        exp = exp.rename(columns=dict(zip(exp.keys(),
-        ['Ano','Mês','NCM','Unidade estatística','País de destino','UF de origem',
-        'Meio de transporte','URF embarque','Quantidade estatística','Kg líquido',
-        'Valor Free On Board','Valor de frete','Valor de seguro'])))
-
-        cc = cc.rename(columns=dict(zip(cc.keys(),['Código do país','Nome do país','Nome do bloco'])))
-        
-        via = via.rename(columns=dict(zip(via.keys(),['Código da via','Descrição da via'])))
-
-        # save to dir
-        os.makedirs(target_dir,exist_ok=True)
-        
-        imp.to_csv(os.path.join(target_dir,'imports.csv'),index=False)
-        exp.to_csv(os.path.join(target_dir,'exports.csv'),index=False)
-        cc.to_csv(os.path.join(target_dir,'country-codes.csv'),index=False)
-        via.to_csv(os.path.join(target_dir,'via-codes.csv'),index=False)
-
-        # load saved files
-        imp, exp, cc, via, target_dir = load_files(year,target_dir)
-        
+    def discard():
+        for f in (part, tag):
+            if os.path.isfile(f):
+                os.remove(f)
+
+    for attempt in range(attempts):
+
+        size = os.path.getsize(part) if os.path.isfile(part) else 0
+        headers = {}
+        if size and os.path.isfile(tag):
+            with open(tag) as f:
+                headers = {'Range': f'bytes={size}-', 'If-Range': f.read()}
+
+        try:
+            with s.get(url, headers=headers, stream=True, timeout=60) as r:
+
+                if r.status_code == 416: # nothing past the partial file: complete only if sizes match
+                    total = remote_size(r)
+                    if total is None:
+                        with s.head(url, allow_redirects=True, timeout=60) as h:
+                            total = remote_size(h)
+                    if total == size:
+                        break
+                    print(f'Partial download of {url} does not match the remote file ({size} != {total} bytes). Restarting...')
+                    discard()
+                    continue
+                r.raise_for_status()
+
+                # 206: resume; 200: (re)start from scratch
+                mode = 'ab' if r.status_code == 206 else 'wb'
+                total = remote_size(r)
+                etag = r.headers.get('ETag')
+                if mode == 'wb':
+                    if etag:
+                        with open(tag, 'w') as f:
+                            f.write(etag)
+                    elif os.path.isfile(tag):
+                        os.remove(tag)
+
+                with open(part, mode) as f:
+                    for block in r.iter_content(BLOCK_SIZE):
+                        f.write(block)
+
+            if total is None or os.path.getsize(part) == total:
+                break
+            if os.path.getsize(part) > total:
+                print(f'Download of {url} is larger than the remote file. Restarting...')
+                discard()
+            else:
+                print(f'Download of {url} stopped short. Resuming...')
+
+        except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError,
+                requests.exceptions.ContentDecodingError):
+            if attempt == attempts - 1:
+                raise
+            print(f'Connection lost while fetching {url}. Resuming...')
+
+    else:
+        raise IOError(f'Could not fetch {url} in {attempts} attempts')
+
+    os.replace(part, file)
+    if os.path.isfile(tag):
+        os.remove(tag)
+
+    return file
+
+
+def fetch_all(jobs: list, max_workers=MAX_WORKERS):
+    """Concurrently download a list of (url, file) pairs with bounded parallelism.
+
+    All downloads are attempted; the first failure is raised once the others are done.
+    """
+
+    errors = []
+    with session(max_workers) as s, ThreadPoolExecutor(max_workers) as pool:
+        futures = {pool.submit(fetch, s, url, file): url for url, file in jobs}
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                print(f'Failed to fetch {futures[future]}: {e}')
+                errors.append(e)
+
+    if errors:
+        raise errors[0]
+
+
+def raw_files(year: int, target_dir: str, root=ROOT):
+    """(url, local file) pairs of the raw COMEX files of a given year."""
+
+    raw = os.path.join(target_dir, 'raw')
+    os.makedirs(raw, exist_ok=True)
+
+    return [(root + 'comexstat-bd/ncm/' + f, os.path.join(raw, f)) for f in [f'IMP_{year}.csv', f'EXP_{year}.csv']] + \
+           [(root + 'tabelas/' + f, os.path.join(raw, f)) for f in ['PAIS_BLOCO.csv', 'PAIS.csv', 'VIA.csv']]
+
+
+def sort_file(src: str, file: str, sort_by: list):
+    """Rewrite a Parquet cache file sorted by sort_by, one value of the first key (e.g. a month) at a time.
+
+    Peak memory is the rows of the largest of those values, not the whole file.
+    """
+
+    key = sort_by[0]
+    target = pq.read_schema(src)
+    values = pq.read_table(src, columns=[key])[key].unique().drop_null().to_pylist()
+    plain = pa.schema([pa.field(f.name, f.type.value_type if pa.types.is_dictionary(f.type) else f.type)
+                       for f in target])
+
+    with pq.ParquetWriter(file, target) as writer:
+        for where in [pc.field(key) == v for v in sorted(values)] + [pc.field(key).is_null()]:
+            # dictionaries decoded so that categories (and the sort) follow the values
+            df = set_dtypes(pq.read_table(src, filters=where).cast(plain).to_pandas())
+            if len(df):
+                writer.write_table(to_table(df.sort_values(sort_by, ignore_index=True), target),
+                                   row_group_size=ROW_GROUP_SIZE)
+
+
+def stream_table(src: str, file: str, columns: list, chunksize=CHUNK_SIZE, sort_by=None):
+    """Convert a raw trade CSV into a Parquet file chunk by chunk.
+
+    Each chunk is renamed, typed and cast to the cache schema, so peak memory is one chunk
+    regardless of the size of the year. With sort_by, the chunks go to a scratch file that is then
+    rewritten in sort order by sort_file (peak memory: one month of rows).
+
+    columns: names given to the CSV columns in order. Files with a shorter header (e.g. export
+             years without freight/insurance values) get the first names only.
+    """
+
+    tmp = file + '.part'
+    scratch = file + '.unsorted' if sort_by else tmp
+    header = read_csv(src, sep=';', encoding='utf-8', nrows=0).columns
+    target = schema(columns[:len(header)])
+
+    try:
+        with pq.ParquetWriter(scratch, target) as writer:
+            for chunk in read_csv(src, sep=';', encoding='utf-8', chunksize=chunksize):
+                chunk = set_dtypes(chunk.rename(columns=dict(zip(chunk.keys(), columns))))
+                writer.write_table(to_table(chunk, target), row_group_size=ROW_GROUP_SIZE)
+        if sort_by:
+            sort_file(scratch, tmp, sort_by)
+    except BaseException:
+        # a failed conversion leaves nothing behind: the next call starts over
+        if os.path.isfile(tmp):
+            os.remove(tmp)
+        raise
     finally:
-        
-        return imp, exp, cc, via, target_dir
\ No newline at end of file
+        if sort_by and os.path.isfile(scratch):
+            os.remove(scratch)
+
+    os.replace(tmp, file)
+
+
+def convert_files(year: int, target_dir: str, chunksize=CHUNK_SIZE, keep_raw=False):
+    """Convert the raw COMEX files of a given year into the Parquet cache."""
+
+    raw = os.path.join(target_dir, 'raw')
+    imp, exp, bc, cc, via = [os.path.join(raw, f) for f in
+                             [f'IMP_{year}.csv', f'EXP_{year}.csv', 'PAIS_BLOCO.csv', 'PAIS.csv', 'VIA.csv']]
+
+    # trade tables: streamed chunk by chunk, then sorted by month/state
+    stream_table(imp, os.path.join(target_dir,TABLES['imp'][1]), IMP_COLUMNS, chunksize, SORT_KEYS['imp'])
+    stream_table(exp, os.path.join(target_dir,TABLES['exp'][1]), EXP_COLUMNS, chunksize, SORT_KEYS['exp'])
+
+    # country/block codes
+    bc = read_csv(bc, sep =';', encoding='ISO-8859-1', usecols = [0,2])
+    cc = read_csv(cc, sep =';', encoding='ISO-8859-1', usecols = [0,3])
+    cc = cc.merge(bc, on = 'CO_PAIS')
+
+    # transport vias
+    via = read_csv(via, sep =';', encoding='ISO-8859-1')
+
+    # rename
+    cc = cc.rename(columns=dict(zip(cc.keys(),CC_COLUMNS)))
+    via = via.rename(columns=dict(zip(via.keys(),VIA_COLUMNS)))
+
+    write_table(cc, os.path.join(target_dir,TABLES['cc'][1]))
+    write_table(via, os.path.join(target_dir,TABLES['via'][1]))
+
+    if not keep_raw:
+        shutil.rmtree(raw)
+
+
+def download_years(years, root=ROOT, chunksize=CHUNK_SIZE, max_workers=MAX_WORKERS, keep_raw=False):
+    """Pull foreign trade (COMEXStats) files for several years from MDIC.GOV.BR into the Parquet cache.
+
+    All files of all years are fetched concurrently over one pooled session (at most max_workers
+    at a time); interrupted downloads resume where they stopped on the next call.
+    root: base URL of the COMEX database (a local HTTP server can stand in for it).
+    chunksize: number of CSV rows typed and written at a time.
+    """
+
+    years = list(years)
+    fetch_all([job for y in years for job in raw_files(y, comex_dir(y), root)], max_workers)
+
+    for y in years:
+        convert_files(y, comex_dir(y), chunksize, keep_raw)
+
+
+def download_files(year: int, target_dir: str, root=ROOT, chunksize=CHUNK_SIZE, max_workers=MAX_WORKERS, keep_raw=False):
+    """Pull foreign trade (COMEXStats) files for a given year from MDIC.GOV.BR and store them as Parquet cache."""
+
+    fetch_all(raw_files(year, target_dir, root), max_workers)
+    convert_files(year, target_dir, chunksize, keep_raw)
+
+
+def cache_files(year: int):
+    """Make sure the Parquet cache of a given year exists (migrating or downloading it) and return its file paths."""
+
+    target_dir = comex_dir(year)
+
+    if not is_cached(target_dir):
+        if all(os.path.isfile(os.path.join(target_dir, csv)) for csv, _ in TABLES.values()):
+            migrate_csv(target_dir)
+        else:
+            print(f'COMEX files unavailable for year {year}. Trying to download from GOV.BR...')
+            download_files(year, target_dir)
+
+    return {name: os.path.join(target_dir, pqt) for name, (_, pqt) in TABLES.items()}
+
+
+def get_comex(year: int, columns=None, filters=None):
+    """Try to load pre-stored foreign trade (COMEXStats) files. Otherwise, pull from MDIC.GOV.BR
+
+    columns, filters: as in load_files (a list for both flows or a dict keyed by 'imp'/'exp').
+    """
+
+    cache_files(year)
+
+    return load_files(year, comex_dir(year), columns, filters)
@@ -1,62 +1,248 @@
 import requests
 import json
+import os
+import random
+import time
+import hashlib
+from datetime import date
+from urllib.parse import urlsplit, parse_qs
 import pandas as pd
 import asyncio
 import aiohttp
 
-async def fetch(s, url):
-    async with s.get(url) as r:
-        if r.status != 200:
-            return 0
-        return await r.text()
-
-async def fetch_all(s, urls):
-    tasks = []
-    for url in urls:
-        task = asyncio.create_task(fetch(s, url))
-        tasks.append(task)
-    res = await asyncio.gather(*tasks)
-    return res
-
-async def import_comex_data(year=2023) -> tuple:
+# typeForm => 1 -> Exportação; 2 -> Importação
+FLUXOS = {"exp": 1, "imp": 2}
+
+MESES = [("01", "Janeiro"), ("02", "Fevereiro"), ("03", "Mar"), ("04", "Abril"), ("05", "Maio"), ("06", "Junho"), ("07", "Julho"),
+         ("08", "Agosto"), ("09", "Setempro"), ("10", "Outubro"), ("11", "Novembro"), ("12", "Dezembro")]
+
+ESTADOS_URL = "http://api.comexstat.mdic.gov.br/pt/location/states?filter=%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22,%22route%22:%22/pt/location/states%22,%22type%22:%221%22,%22group%22:%22gerais%22,%22groupText%22:%22Gerais%22,%22hint%22:%22fieldsForm.general.noUf.description%22,%22placeholder%22:%22UFs%20do%20Produto%22%7D"
+
+# consulta geral por ano, fluxo (tipo), estado e mês
+GERAL_URL = "http://api.comexstat.mdic.gov.br/general?filter=%7B%22yearStart%22:%22{year}%22,%22yearEnd%22:%22{year}%22,%22typeForm%22:{tipo},%22typeOrder%22:2,%22filterList%22:%5B%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22,%22route%22:%22/pt/location/states%22,%22type%22:%221%22,%22group%22:%22gerais%22,%22groupText%22:%22Gerais%22,%22hint%22:%22fieldsForm.general.noUf.description%22,%22placeholder%22:%22UFs%20do%20Produto%22%7D%5D,%22filterArray%22:%5B%7B%22item%22:%5B%22{id_estado}%22%5D,%22idInput%22:%22noUf%22%7D%5D,%22rangeFilter%22:%5B%5D,%22detailDatabase%22:%5B%7B%22id%22:%22noUrf%22,%22text%22:%22URF%22%7D,%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22%7D,%7B%22id%22:%22noPaispt%22,%22text%22:%22Pa%C3%ADs%22%7D,%7B%22id%22:%22noBlocopt%22,%22text%22:%22Bloco%20Econ%C3%B4mico%22%7D,%7B%22id%22:%22noVia%22,%22text%22:%22Via%22%7D,%7B%22id%22:%22noNcmpt%22,%22text%22:%22NCM%20-%20Nomenclatura%20Comum%20do%20Mercosul%22,%22parentId%22:%22coNcm%22,%22parent%22:%22C%C3%B3digo%20NCM%22%7D,%7B%22id%22:%22noSh6pt%22,%22text%22:%22Subposi%C3%A7%C3%A3o%20(SH6)%22,%22parentId%22:%22coSh6%22,%22parent%22:%22Codigo%20SH6%22%7D,%7B%22id%22:%22noSh4pt%22,%22text%22:%22Posi%C3%A7%C3%A3o%20(SH4)%22,%22parentId%22:%22coSh4%22,%22parent%22:%22Codigo%20SH4%22%7D,%7B%22id%22:%22noSh2pt%22,%22text%22:%22Cap%C3%ADtulo%20(SH2)%22,%22parentId%22:%22coSh2%22,%22parent%22:%22Codigo%20SH2%22%7D,%7B%22id%22:%22noSecpt%22,%22text%22:%22Se%C3%A7%C3%A3o%22,%22parentId%22:%22coNcmSecrom%22,%22parent%22:%22Codigo%20Se%C3%A7%C3%A3o%22%7D%5D,%22monthDetail%22:true,%22metricFOB%22:true,%22metricKG%22:true,%22metricStatistic%22:true,%22monthStart%22:%22{mes_num}%22,%22monthEnd%22:%22{mes_num}%22,%22formQueue%22:%22general%22,%22langDefault%22:%22pt%22,%22monthStartName%22:%22{mes}%22,%22monthEndName%22:%22{mes}%22%7D"
+
+# requisições simultâneas, tentativas e espera inicial (s) entre tentativas
+CONCORRENCIA = 20
+TENTATIVAS = 5
+ESPERA = 1.0
+
+# status HTTP que justificam nova tentativa
+STATUS_RETRY = {429, 500, 502, 503, 504}
+
+# cache de respostas: diretório, validade (s) para o ano corrente e tamanho máximo (bytes)
+CACHE_DIR = os.path.join("..", "data", "comexstat-cache")
+CACHE_TTL = 6 * 3600
+CACHE_MAX = 2 * 1024**3
+
+
+def cache_key(url):
+    """Chave do cache: hash do JSON de filtro decodificado e normalizado (ou da URL, se não houver filtro)."""
+    filtro = parse_qs(urlsplit(url).query).get("filter")
+    if filtro:
+        try:
+            filtro = json.dumps(json.loads(filtro[0]), sort_keys=True, ensure_ascii=False)
+        except ValueError:
+            filtro = filtro[0]
+    return hashlib.sha256((filtro or url).encode()).hexdigest()
+
+
+def cache_ttl(url):
+    """Validade da resposta: anos fechados não mudam (None = imutável); ano corrente expira em CACHE_TTL."""
+    filtro = parse_qs(urlsplit(url).query).get("filter")
+    try:
+        ano = int(json.loads(filtro[0])["yearEnd"])
+    except (TypeError, ValueError, KeyError):
+        return CACHE_TTL
+    return None if ano < date.today().year else CACHE_TTL
+
+
+def cache_get(cache, chave):
+    """Lê corpo e metadados de uma resposta em cache. Retorna (None, None) se ausente."""
+    corpo, meta = os.path.join(cache, chave + ".json"), os.path.join(cache, chave + ".meta")
+    if not (os.path.isfile(corpo) and os.path.isfile(meta)):
+        return None, None
+    with open(meta) as f:
+        meta = json.load(f)
+    with open(corpo, encoding="utf-8") as f:
+        corpo = f.read()
+    return corpo, meta
+
+
+def cache_put(cache, chave, text, headers, ttl):
+    """Grava resposta e validadores (ETag/Last-Modified) no cache (escrita atômica)."""
+    os.makedirs(cache, exist_ok=True)
+    meta = {"stored": time.time(), "ttl": ttl,
+            "etag": headers.get("ETag"), "last_modified": headers.get("Last-Modified")}
+    for ext, conteudo in ((".json", text), (".meta", json.dumps(meta))):
+        arquivo = os.path.join(cache, chave + ext)
+        with open(arquivo + ".part", "w", encoding="utf-8") as f:
+            f.write(conteudo)
+        os.replace(arquivo + ".part", arquivo)
+
+
+def cache_touch(cache, chave, meta=None):
+    """Marca uso recente (LRU) e, após revalidação, renova a data de armazenamento."""
+    if meta is not None:
+        meta["stored"] = time.time()
+        with open(os.path.join(cache, chave + ".meta"), "w") as f:
+            json.dump(meta, f)
+    os.utime(os.path.join(cache, chave + ".json"))
+
+
+def evict_cache(cache=CACHE_DIR, max_bytes=CACHE_MAX):
+    """Remove as respostas usadas há mais tempo até o cache caber em max_bytes."""
+    if not os.path.isdir(cache):
+        return
+    entradas = []
+    for f in os.listdir(cache):
+        if f.endswith(".json"):
+            st = os.stat(os.path.join(cache, f))
+            entradas.append((st.st_mtime, st.st_size, f[:-len(".json")]))
+    total = sum(e[1] for e in entradas)
+    for _, tamanho, chave in sorted(entradas):
+        if total <= max_bytes:
+            break
+        for ext in (".json", ".meta"):
+            os.remove(os.path.join(cache, chave + ext))
+        total -= tamanho
+
+
+async def fetch(s, url, sem, tentativas=TENTATIVAS, espera=ESPERA, cache=CACHE_DIR):
+    """Requisição GET com limite de concorrência, novas tentativas com espera exponencial e cache em disco.
+
+    Respostas ainda válidas são servidas do cache sem requisição; respostas expiradas são
+    revalidadas com If-None-Match/If-Modified-Since. cache=None desativa o cache.
+    """
+    chave = cache_key(url)
+    corpo, meta = cache_get(cache, chave) if cache else (None, None)
+
+    headers = {}
+    if meta is not None:
+        if meta["ttl"] is None or time.time() - meta["stored"] < meta["ttl"]:
+            cache_touch(cache, chave)
+            return corpo
+        if meta["etag"]:
+            headers["If-None-Match"] = meta["etag"]
+        if meta["last_modified"]:
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+    for tentativa in range(tentativas):
+        try:
+            async with sem, s.get(url, headers=headers) as r:
+                if r.status == 304 and corpo is not None:
+                    cache_touch(cache, chave, meta)
+                    return corpo
+                if r.status == 200:
+                    text = await r.text()
+                    if cache:
+                        cache_put(cache, chave, text, r.headers, cache_ttl(url))
+                    return text
+                if r.status not in STATUS_RETRY:
+                    raise aiohttp.ClientResponseError(r.request_info, r.history, status=r.status)
+        except (aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError):
+            pass
+        if tentativa < tentativas - 1:
+            await asyncio.sleep(espera * 2**tentativa * (1 + random.random()))
+    raise aiohttp.ClientError(f"Falha após {tentativas} tentativas: {url}")
+
+
+def read_log(log):
+    """Lê o registro de páginas concluídas: linhas 'fluxo;estado;mês'."""
+    if not os.path.isfile(log):
+        return set()
+    with open(log) as f:
+        return {tuple(l.strip().split(";")) for l in f if l.strip()}
+
+
+def write_page(text, arquivo):
+    """Converte uma página JSON em arquivo Parquet (escrita atômica). Retorna o no. de linhas."""
+    df = pd.DataFrame(json.loads(text)["data"]["list"])
+    if not df.empty:
+        df.to_parquet(arquivo + ".part", index=False)
+        os.replace(arquivo + ".part", arquivo)
+    return len(df)
+
+
+async def crawl_page(s, sem, url, chave, path, log, cache=CACHE_DIR):
+    """Baixa, converte e grava uma página; registra a chave (fluxo, estado, mês) como concluída."""
+    fluxo, estado, mes = chave
+    text = await fetch(s, url, sem, cache=cache)
+    n = await asyncio.to_thread(write_page, text, os.path.join(path, fluxo, f"{estado}-{mes}.parquet"))
+    with open(log, "a") as f:
+        f.write(";".join(chave) + "\n")
+    return n
+
+
+def read_sink(path, fluxo):
+    """Monta o dataframe de um fluxo a partir das páginas gravadas em disco."""
+    pasta = os.path.join(path, fluxo)
+    arquivos = sorted(f for f in os.listdir(pasta) if f.endswith(".parquet"))
+    if not arquivos:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(os.path.join(pasta, f)) for f in arquivos], ignore_index=True)
+
+
+async def import_comex_data(year=2023, path=None, concorrencia=CONCORRENCIA, cache=CACHE_DIR) -> tuple:
     """
     Importa os dados do Comexstats geral (http://comexstat.mdic.gov.br/pt/geral)
     de Importação e Exportação.
 
+    Cada página (fluxo, estado, mês) é gravada em Parquet assim que chega e registrada
+    em 'concluidas.log'. Uma importação interrompida, ao ser reiniciada, busca apenas
+    as páginas que faltam. No ano corrente todas as páginas passam por fetch a cada
+    chamada: as recentes vêm do cache, as expiradas são revalidadas no servidor.
+
     Parametros
     -------------
-    start_year: int
-       Ano inicial da pesquisa.
-    end_year: int
-       Ano final da pesquisa.
+    year: int
+       Ano da pesquisa.
+    path: str
+       Diretório das páginas gravadas. Padrão: '../data/comexstat-<year>'.
+    concorrencia: int
+       Número máximo de requisições simultâneas.
+    cache: str
+       Diretório do cache de respostas HTTP (None desativa). Anos fechados são servidos
+       do cache sem expirar; o ano corrente é revalidado após CACHE_TTL segundos.
 
     Retorno
     -------------
     tuple
        Tupla com dataframe exportação e dataframe importação, respectivamente.
     """
-    # typeForm => 1 -> Exportação; 2 -> Importação
-    estados_url = "http://api.comexstat.mdic.gov.br/pt/location/states?filter=%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22,%22route%22:%22/pt/location/states%22,%22type%22:%221%22,%22group%22:%22gerais%22,%22groupText%22:%22Gerais%22,%22hint%22:%22fieldsForm.general.noUf.description%22,%22placeholder%22:%22UFs%20do%20Produto%22%7D"
-    lista_estados = [x["id"] for x in json.loads(requests.get(estados_url).text)]
-
-    meses = [("01", "Janeiro"), ("02", "Fevereiro"), ("03", "Mar"), ("04", "Abril"), ("05", "Maio"), ("06", "Junho"), ("07", "Julho"), 
-             ("08", "Agosto"), ("09", "Setempro"), ("10", "Outubro"), ("11", "Novembro"), ("12", "Dezembro")]
-    
-    exp_urls = list()
-    imp_urls = list()
-    
-    for id_estado in lista_estados:
-        for mes_num, mes in meses:
-            exp_urls.append(f"http://api.comexstat.mdic.gov.br/general?filter=%7B%22yearStart%22:%22{year}%22,%22yearEnd%22:%22{year}%22,%22typeForm%22:1,%22typeOrder%22:2,%22filterList%22:%5B%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22,%22route%22:%22/pt/location/states%22,%22type%22:%221%22,%22group%22:%22gerais%22,%22groupText%22:%22Gerais%22,%22hint%22:%22fieldsForm.general.noUf.description%22,%22placeholder%22:%22UFs%20do%20Produto%22%7D%5D,%22filterArray%22:%5B%7B%22item%22:%5B%22{id_estado}%22%5D,%22idInput%22:%22noUf%22%7D%5D,%22rangeFilter%22:%5B%5D,%22detailDatabase%22:%5B%7B%22id%22:%22noUrf%22,%22text%22:%22URF%22%7D,%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22%7D,%7B%22id%22:%22noPaispt%22,%22text%22:%22Pa%C3%ADs%22%7D,%7B%22id%22:%22noBlocopt%22,%22text%22:%22Bloco%20Econ%C3%B4mico%22%7D,%7B%22id%22:%22noVia%22,%22text%22:%22Via%22%7D,%7B%22id%22:%22noNcmpt%22,%22text%22:%22NCM%20-%20Nomenclatura%20Comum%20do%20Mercosul%22,%22parentId%22:%22coNcm%22,%22parent%22:%22C%C3%B3digo%20NCM%22%7D,%7B%22id%22:%22noSh6pt%22,%22text%22:%22Subposi%C3%A7%C3%A3o%20(SH6)%22,%22parentId%22:%22coSh6%22,%22parent%22:%22Codigo%20SH6%22%7D,%7B%22id%22:%22noSh4pt%22,%22text%22:%22Posi%C3%A7%C3%A3o%20(SH4)%22,%22parentId%22:%22coSh4%22,%22parent%22:%22Codigo%20SH4%22%7D,%7B%22id%22:%22noSh2pt%22,%22text%22:%22Cap%C3%ADtulo%20(SH2)%22,%22parentId%22:%22coSh2%22,%22parent%22:%22Codigo%20SH2%22%7D,%7B%22id%22:%22noSecpt%22,%22text%22:%22Se%C3%A7%C3%A3o%22,%22parentId%22:%22coNcmSecrom%22,%22parent%22:%22Codigo%20Se%C3%A7%C3%A3o%22%7D%5D,%22monthDetail%22:true,%22metricFOB%22:true,%22metricKG%22:true,%22metricStatistic%22:true,%22monthStart%22:%22{mes_num}%22,%22monthEnd%22:%22{mes_num}%22,%22formQueue%22:%22general%22,%22langDefault%22:%22pt%22,%22monthStartName%22:%22{mes}%22,%22monthEndName%22:%22{mes}%22%7D")
-            imp_urls.append(f"http://api.comexstat.mdic.gov.br/general?filter=%7B%22yearStart%22:%22{year}%22,%22yearEnd%22:%22{year}%22,%22typeForm%22:2,%22typeOrder%22:2,%22filterList%22:%5B%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22,%22route%22:%22/pt/location/states%22,%22type%22:%221%22,%22group%22:%22gerais%22,%22groupText%22:%22Gerais%22,%22hint%22:%22fieldsForm.general.noUf.description%22,%22placeholder%22:%22UFs%20do%20Produto%22%7D%5D,%22filterArray%22:%5B%7B%22item%22:%5B%22{id_estado}%22%5D,%22idInput%22:%22noUf%22%7D%5D,%22rangeFilter%22:%5B%5D,%22detailDatabase%22:%5B%7B%22id%22:%22noUrf%22,%22text%22:%22URF%22%7D,%7B%22id%22:%22noUf%22,%22text%22:%22UF%20do%20Produto%22%7D,%7B%22id%22:%22noPaispt%22,%22text%22:%22Pa%C3%ADs%22%7D,%7B%22id%22:%22noBlocopt%22,%22text%22:%22Bloco%20Econ%C3%B4mico%22%7D,%7B%22id%22:%22noVia%22,%22text%22:%22Via%22%7D,%7B%22id%22:%22noNcmpt%22,%22text%22:%22NCM%20-%20Nomenclatura%20Comum%20do%20Mercosul%22,%22parentId%22:%22coNcm%22,%22parent%22:%22C%C3%B3digo%20NCM%22%7D,%7B%22id%22:%22noSh6pt%22,%22text%22:%22Subposi%C3%A7%C3%A3o%20(SH6)%22,%22parentId%22:%22coSh6%22,%22parent%22:%22Codigo%20SH6%22%7D,%7B%22id%22:%22noSh4pt%22,%22text%22:%22Posi%C3%A7%C3%A3o%20(SH4)%22,%22parentId%22:%22coSh4%22,%22parent%22:%22Codigo%20SH4%22%7D,%7B%22id%22:%22noSh2pt%22,%22text%22:%22Cap%C3%ADtulo%20(SH2)%22,%22parentId%22:%22coSh2%22,%22parent%22:%22Codigo%20SH2%22%7D,%7B%22id%22:%22noSecpt%22,%22text%22:%22Se%C3%A7%C3%A3o%22,%22parentId%22:%22coNcmSecrom%22,%22parent%22:%22Codigo%20Se%C3%A7%C3%A3o%22%7D%5D,%22monthDetail%22:true,%22metricFOB%22:true,%22metricKG%22:true,%22metricStatistic%22:true,%22monthStart%22:%22{mes_num}%22,%22monthEnd%22:%22{mes_num}%22,%22formQueue%22:%22general%22,%22langDefault%22:%22pt%22,%22monthStartName%22:%22{mes}%22,%22monthEndName%22:%22{mes}%22%7D")
-
-    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=350)) as session:
-        exp_dfs, imp_dfs = await fetch_all(session, exp_urls), await fetch_all(session, imp_urls)
-
-        return (
-            pd.concat([pd.DataFrame(json.loads(x)["data"]["list"]) for x in exp_dfs if x != 0], ignore_index=True),
-            pd.concat([pd.DataFrame(json.loads(x)["data"]["list"]) for x in imp_dfs if x != 0], ignore_index=True),
-        )
+    path = path or os.path.join("..", "data", f"comexstat-{year}")
+    for fluxo in FLUXOS:
+        os.makedirs(os.path.join(path, fluxo), exist_ok=True)
+
+    log = os.path.join(path, "concluidas.log")
+    concluidas = read_log(log)
+
+    lista_estados = [x["id"] for x in json.loads(requests.get(ESTADOS_URL).text)]
+
+    # páginas pendentes
+    paginas = {}
+    for fluxo, tipo in FLUXOS.items():
+        for id_estado in lista_estados:
+            for mes_num, mes in MESES:
+                chave = (fluxo, str(id_estado), mes_num)
+                url = GERAL_URL.format(year=year, tipo=tipo, id_estado=id_estado, mes_num=mes_num, mes=mes)
+                # só páginas de anos fechados ficam concluídas de vez; as do ano corrente passam
+                # sempre por fetch, que as serve do cache ou as revalida após CACHE_TTL
+                if chave not in concluidas or cache_ttl(url) is not None:
+                    paginas[chave] = url
+
+    sem = asyncio.Semaphore(concorrencia)
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concorrencia)) as session:
+        tasks = [asyncio.create_task(crawl_page(session, sem, url, chave, path, log, cache)) for chave, url in paginas.items()]
+        res = await asyncio.gather(*tasks, return_exceptions=True)
+
+    if cache:
+        evict_cache(cache)
+
+    falhas = [chave for chave, r in zip(paginas, res) if isinstance(r, Exception)]
+    if falhas:
+        print(f"{len(falhas)} de {len(paginas)} páginas falharam; execute novamente para buscar apenas as pendentes.")
+
+    return read_sink(path, "exp"), read_sink(path, "imp")
 
 # df_exp, df_imp = asyncio.run(import_comex_data())  # --> for .py scripts
-# df_exp, df_imp = await import_comex_data() # --> for .ipynb script
\ No newline at end of file
+# df_exp, df_imp = await import_comex_data() # --> for .ipynb script
@@ -1,21 +1,174 @@
-from networkx import spring_layout
-from numpy import asarray
+from networkx import spring_layout, rescale_layout
+from numpy import asarray, fromiter, cos, sin, pi, arange, sqrt, clip, intp, minimum, maximum, \
+                  bincount, flatnonzero, stack, einsum, argsort, split, diff, add
+from numpy.random import default_rng
+from itertools import chain
+from collections import OrderedDict
+from numbers import Integral
+import hashlib
+
+# layouts memorizados (só os reprodutíveis): (hash da estrutura, layout, seed) -> coordenadas
+LAYOUT_CACHE = OrderedDict()
+LAYOUT_CACHE_SIZE = 32
+
+# a partir deste no. de nós, 'auto' usa o layout de forças com grade em vez do spring clássico
+FORCE_MIN_NODES = 500
+
+
+def structure_hash(G):
+    """Hash da estrutura do grafo: nós, arestas e o peso ('weight') de cada aresta, que o spring_layout usa.
+
+    Os demais atributos não afetam os layouts e ficam de fora.
+    """
+
+    h = hashlib.sha1()
+    h.update(repr(sorted(G.nodes(), key=repr)).encode())
+    h.update(repr(sorted(((sorted((u, v), key=repr), w) for u, v, w in G.edges(data='weight')), key=repr)).encode())
+
+    return h.hexdigest()
+
+
+def hub(G):
+    """Retorna o nó central se G for uma estrela (um nó ligado a todos os demais e mais nenhuma aresta)."""
+
+    n = G.number_of_nodes()
+    if n < 3 or G.number_of_edges() != n - 1:
+        return None
+
+    c, d = max(G.degree(), key=lambda x: x[1])
+
+    return c if d == n - 1 else None
+
+
+def radial_layout(G, center=None):
+    """Layout radial em forma fechada: nó central na origem, demais nós igualmente espaçados no círculo."""
+
+    center = hub(G) if center is None else center
+    others = [v for v in G.nodes() if v != center]
+    t = 2*pi*arange(len(others))/max(len(others), 1)
+
+    coords = {v: asarray([x, y]) for v, x, y in zip(others, cos(t), sin(t))}
+    if center is not None:
+        coords[center] = asarray([0.0, 0.0])
+
+    return coords
+
+
+def force_layout(G, seed=None, iterations=50):
+    """Layout de forças (Fruchterman-Reingold) vetorizado com aproximação em grade (estilo Barnes-Hut).
+
+    A repulsão entre nós de células distintas é aproximada pelo centróide de cada célula de uma
+    grade ~sqrt(n)/4 x sqrt(n)/4; dentro da mesma célula é exata. A atração percorre apenas as
+    arestas. Custo por iteração ~O(n^1.5) em vez de O(n^2).
+    """
+
+    nodes = list(G)
+    n, ne = len(nodes), G.number_of_edges()
+    if n == 0:
+        return {}
+    idx = {v: i for i, v in enumerate(nodes)}
+    e = fromiter(chain.from_iterable((idx[u], idx[v]) for u, v in G.edges()), dtype=intp, count=2*ne).reshape(-1, 2)
+
+    pos = default_rng(seed).random((n, 2))
+    k = sqrt(1.0/max(n, 1)) # distância ideal
+    t = 0.1 # "temperatura": deslocamento máximo por iteração
+    dt = t/(iterations + 1)
+    cells = int(clip(sqrt(n)/4, 1, 32))
+
+    for _ in range(iterations):
+
+        # grade: célula de cada nó, massa e centróide das células ocupadas
+        lo = pos.min(0)
+        span = maximum(pos.max(0) - lo, 1e-9)
+        cell = minimum(((pos - lo)/span*cells).astype(intp), cells - 1)
+        cid = cell[:, 0]*cells + cell[:, 1]
+        cnt = bincount(cid, minlength=cells*cells).astype(float)
+        occ = flatnonzero(cnt)
+        cen = stack([bincount(cid, pos[:, 0], cells*cells), bincount(cid, pos[:, 1], cells*cells)], 1)[occ]/cnt[occ, None]
+
+        # repulsão: campo distante pelos centróides (exceto a própria célula)
+        d = pos[:, None, :] - cen[None, :, :]
+        d2 = maximum(einsum('ijk,ijk->ij', d, d), 1e-9)
+        w = k*k*cnt[occ][None, :]/d2
+        w[cid[:, None] == occ[None, :]] = 0
+        disp = einsum('ijk,ij->ik', d, w)
+
+        # repulsão: campo próximo exato dentro de cada célula
+        order = argsort(cid, kind='stable')
+        for g in split(order, flatnonzero(diff(cid[order])) + 1):
+            if len(g) > 1:
+                dd = pos[g, None, :] - pos[None, g, :]
+                disp[g] += einsum('ijk,ij->ik', dd, k*k/maximum(einsum('ijk,ijk->ij', dd, dd), 1e-9))
+
+        # atração ao longo das arestas
+        d = pos[e[:, 0]] - pos[e[:, 1]]
+        f = d*(sqrt((d*d).sum(1))/k)[:, None]
+        add.at(disp, e[:, 0], -f)
+        add.at(disp, e[:, 1], f)
+
+        # deslocamento limitado pela temperatura
+        l = maximum(sqrt((disp*disp).sum(1)), 1e-9)
+        pos += disp*(minimum(l, t)/l)[:, None]
+        t -= dt
+
+    return dict(zip(nodes, rescale_layout(pos)))
+
+
+def layout_graph(G, seed, layout='spring'):
+    """Coordenadas dos nós, memorizadas por estrutura do grafo, layout e seed.
+
+    Só layouts reprodutíveis são memorizados: seed inteira, ou o radial (que não usa seed). Com
+    seed=None (ou um gerador) o layout é recalculado a cada chamada. Cada chamada recebe cópias
+    das coordenadas, de modo que alterá-las não afeta o cache.
+
+    layout: 'spring' (networkx), 'force' (vetorizado com grade, para grafos grandes),
+            'radial' (estrela: país central e parceiros em círculo) ou 'auto' (radial para estrelas,
+            spring até FORCE_MIN_NODES nós, force acima disso).
+    """
+
+    if layout == 'auto':
+        if hub(G) is not None:
+            layout = 'radial'
+        else:
+            layout = 'spring' if G.number_of_nodes() < FORCE_MIN_NODES else 'force'
+
+    cached = layout == 'radial' or (isinstance(seed, Integral) and not isinstance(seed, bool))
+    key = (structure_hash(G), layout, None if layout == 'radial' else seed)
+    if cached and key in LAYOUT_CACHE:
+        LAYOUT_CACHE.move_to_end(key)
+        return {v: c.copy() for v, c in LAYOUT_CACHE[key].items()}
+
+    if layout == 'spring':
+        coords = spring_layout(G,seed=seed)
+    elif layout == 'force':
+        coords = force_layout(G,seed)
+    elif layout == 'radial':
+        coords = radial_layout(G)
+    else:
+        raise ValueError(f"Layouts possíveis: 'spring', 'force', 'radial', 'auto'. Recebido: {layout}")
+
+    if not cached:
+        return coords
+
+    LAYOUT_CACHE[key] = coords
+    if len(LAYOUT_CACHE) > LAYOUT_CACHE_SIZE:
+        LAYOUT_CACHE.popitem(last=False)
+
+    return {v: c.copy() for v, c in coords.items()}
+
 
 # Helper function
-def base_data(G,fob_scale,seed):
+def base_data(G,fob_scale,seed,layout='spring'):
     """Função de utilidade"""
-    
-    # escalona FOB
-    fob = []
-    for e in G.edges():
-        fob.append(G[e[0]][e[1]]['FOB'])
-    fob = asarray(fob)/fob_scale # escala em USD
 
-    # cria mapa de cores para arestas
+    # escalona FOB (uma única passada sobre as arestas)
     ne = G.number_of_edges()
+    fob = fromiter((w for _, _, w in G.edges(data='FOB')), dtype=float, count=ne)/fob_scale # escala em USD
+
+    # cria mapa de cores para arestas
     edge_colors = range(2,ne+2)
 
-    # controle de randomização das coordenadas dos vértices/nós 
-    coords = spring_layout(G,seed=seed) # layout
+    # controle de randomização das coordenadas dos vértices/nós
+    coords = layout_graph(G,seed,layout) # layout
 
-    return fob, edge_colors, coords
\ No newline at end of file
+    return fob, edge_colors, coords
@@ -1,72 +1,224 @@
-from pandas import read_csv, Series, to_datetime
+from pandas import read_csv, read_parquet, concat, DataFrame, Index, Series, to_datetime, factorize
+from numpy import flatnonzero, r_
 from seaborn import lineplot
+import lod, os
+
+URL = 'https://www.gov.br/receitafederal/dados/repasse-s.csv'
+
+# local snapshot of the raw table
+SNAPSHOT = '../data/rfb-repasse-s.parquet'
+
+# month abbreviations (locale pt_BR) -> month numbers
+MESES = dict(zip(['jan','fev','mar','abr','mai','jun','jul','ago','set','out','nov','dez'],
+                 ['0' + str(i) for i in range(1,10)] + ['10','11','12']))
+
+
+def transform(df_o):
+    """Vectorized transform of the raw RFB table.
+
+    'Mês / Ano de Referência' has only a few hundred distinct values, so it is parsed once per
+    distinct value and broadcast back with the factorized codes.
+    """
+
+    codes, uniques = factorize(df_o['Mês / Ano de Referência'])
+    my = Series(uniques).str.split('/', n=1, expand=True)
+    m, y = my[0], '20' + my[1]
+    p = to_datetime(y + '-' + m.map(MESES), format='%Y-%m')
+
+    # 'Entidade' is shared with df_o (copy-on-write), not duplicated
+    return DataFrame({'Mês': m.to_numpy()[codes],
+                      'Ano': y.to_numpy()[codes],
+                      'Entidade': df_o['Entidade'],
+                      'Total Repassado': df_o['Total Repassado'].str.replace('.','',regex=False).str.replace(',','.',regex=False).astype(float),
+                      'Período': p.to_numpy()[codes]},
+                     index=df_o.index)
+
+
+def refresh_snapshot(source=URL, snapshot=SNAPSHOT):
+    """Append to the local snapshot the reference months of source that it does not have yet."""
+
+    new = read_csv(source,sep=';')
+
+    if os.path.isfile(snapshot):
+        old = read_parquet(snapshot)
+        new = new[~new['Mês / Ano de Referência'].isin(old['Mês / Ano de Referência'].unique())]
+        if new.empty:
+            print('Snapshot is up to date.')
+            return old
+        new = concat([old, new], ignore_index=True)
+
+    n = new['Mês / Ano de Referência'].nunique()
+    os.makedirs(os.path.dirname(snapshot) or '.', exist_ok=True)
+    new.to_parquet(snapshot + '.part', index=False)
+    os.replace(snapshot + '.part', snapshot)
+    print(f'Snapshot updated: {n} reference months in {snapshot}')
+
+    return new
+
+
+def load_data(keep_orig: True, show_links: False, source=URL, snapshot=SNAPSHOT, refresh=False):
+    """Load data from RFB on government resource transfer.
+
+    Data is served from the local snapshot when it exists; refresh=True appends the months published
+    since the last snapshot. snapshot=None always reads from source. With keep_orig, the original frame
+    is returned as read (no copy) next to the transformed one.
+    """
 
-def load_data(keep_orig: True, show_links: False):
-    """Load data from RFB on government resource transfer."""
-    
-    print('Extracting data from Receita Federal do Brasil...')
-    
     # extract
-    df_o = read_csv('https://www.gov.br/receitafederal/dados/repasse-s.csv',sep=';')
-    df = df_o.copy()
+    if snapshot is None:
+        print('Extracting data from Receita Federal do Brasil...')
+        df_o = read_csv(source,sep=';')
+    elif refresh or not os.path.isfile(snapshot):
+        print('Extracting data from Receita Federal do Brasil...')
+        df_o = refresh_snapshot(source, snapshot)
+    else:
+        df_o = read_parquet(snapshot)
 
     # transform
-    m, y = [], []
-    for i in df['Mês / Ano de Referência'].str.split('/'):
-        m.append(i[0])
-        y.append('20' + i[1]) 
-    df['Mês'] = m
-    df['Ano'] = y
-    df['Total Repassado'] = df['Total Repassado'].str.replace('.','',regex=False).str.replace(',','.',regex=False).apply(lambda x: float(x))
-    df = df.drop('Mês / Ano de Referência',axis=1)
-    
-    # load
-    df = df[['Mês','Ano','Entidade','Total Repassado']]
-    
+    df = transform(df_o)
+
     print('Data loaded successfully.')
-    
+
     if show_links:
         print(f'Extracted from: https://www.gov.br/receitafederal/dados/repasse-s.csv\n')
         print(f'Metadata on: https://www.gov.br/receitafederal/dados/repasse-s-metadados.pdf\n')
-        
+
     if keep_orig:
         return df_o,df
     else:
         return df
-    
-    
+
+
 def map_my(x):
     """Create simple mapping relationship between months and numbers. Like locale: pt_BR."""
-    map_my = dict(zip(['jan','fev','mar','abr','mai','jun','jul','ago','set','out','nov','dez'],
-                  ['0' + str(i) for i in range(1,10)] + ['10','11','12'] ))    
-    
+
     m,y = x.split('/')
-        
-    return y + '-' + map_my[m]
 
+    return y + '-' + MESES[m]
+
+
+def period(df):
+    """Typed 'Período' column from 'Mês' and 'Ano' (for frames not built by load_data)."""
+
+    return to_datetime(df['Ano'] + '-' + df['Mês'].map(MESES), format='%Y-%m')
+
+
+class EntityIndex:
+    """RFB transfers grouped by entity, built once from load_data.
+
+    Rows are sorted by ('Entidade', 'Período') and indexed by 'Período', so each entity is a
+    contiguous block: lookup is a dict access and slices are reused across plots.
+    """
+
+    def __init__(self, df):
+
+        if 'Período' not in df:
+            df = df.assign(**{'Período': period(df)})
+
+        self.df = df.sort_values(['Entidade','Período'], kind='stable').set_index('Período')
+
+        e = self.df['Entidade'].to_numpy()
+        bounds = flatnonzero(e[1:] != e[:-1]) + 1
+        self._bounds = {e[s]: (s, t) for s, t in zip(r_[0, bounds], r_[bounds, len(e)])} if len(e) else {}
+        self._slices = {}
+
+        self.entities = frozenset(self._bounds)
+
+    def __contains__(self, entity):
+        return entity in self._bounds
+
+    def __len__(self):
+        return len(self._bounds)
+
+    def __getitem__(self, entity):
+        """Time series (DatetimeIndex) of one entity."""
+
+        if entity not in self._slices:
+            if entity not in self._bounds:
+                raise ValueError(f'Possible entities are: {sorted(self.entities)}')
+            s, t = self._bounds[entity]
+            self._slices[entity] = self.df.iloc[s:t]
+
+        return self._slices[entity]
+
+
+def lineplot_lod(x, y, ax, color, label, errorbar='auto', max_points=None, method='lttb'):
+    """Seaborn lineplot of one series, reduced to the resolution of ax when there is nothing to aggregate.
+
+    errorbar='auto': with one row per x, seaborn's estimator and bootstrap interval are skipped
+    (they would only reproduce the data, at the cost of the bootstrap) and the series is reduced
+    to about max_points points (lod.indices: 'lttb' or 'minmax'; default from the axes width).
+    With repeated x values, seaborn aggregates and draws its default interval, as before. Any
+    other errorbar is passed to seaborn as is, on the full series.
+    """
+
+    if errorbar == 'auto' and Index(x).is_unique:
+        x, y = Index(x), Series(y)
+        if not x.is_monotonic_increasing: # EntityIndex series are already sorted
+            order = x.argsort()
+            x, y = x[order], y.iloc[order]
+        xs, ys = lod.downsample(x, y.to_numpy(), max_points, method, ax)
+        return lineplot(x=Series(xs, name=x.name), y=Series(ys, name=y.name), # names label the axes
+                        estimator=None, errorbar=None, sort=False, color=color, label=label, ax=ax)
+
+    return lineplot(x=x, y=y, color=color, label=label, ax=ax,
+                    **({} if errorbar == 'auto' else {'errorbar': errorbar}))
+
+
+def plot_ts_rfb(df, entity, ax, color, errorbar='auto', max_points=None, method='lttb'):
+    """Plot time series for specific entity. df may be a dataframe or an EntityIndex.
+
+    errorbar, max_points and method: see lineplot_lod (default: no aggregation and no interval
+    when each period has one row, with the series reduced to the axes resolution).
+    """
+
+    if isinstance(df, EntityIndex):
+        df_e = df[entity]
+        return lineplot_lod(df_e.index, df_e['Total Repassado'], ax, color, entity, errorbar, max_points, method)
 
-def plot_ts_rfb(df, entity, ax, color):
-    """Plot time series for specific entity."""
-    
     # entity list
     elist = df['Entidade'].unique()
-    
+
     # check
     if entity not in elist:
-        
+
         raise ValueError(f'Possible entities are: {elist}')
-    
+
     else:
-        
+
         df_e = df[df['Entidade'] == entity].reset_index(drop=True)
-        df_e['Período'] = Series([v['Mês'] + '/' + v['Ano'] for i,v in df_e.iterrows()])
-        df_e['Período'] = to_datetime(df_e['Período'].apply(lambda x: map_my(x)))
-
-        s1 = lineplot(data=df_e,
-                        x='Período', y='Total Repassado',
-                        color=color,
-                        label=entity,
-                        #errorbar=None, 
-                        ax=ax)
-        
-    return s1
\ No newline at end of file
+        if 'Período' not in df_e:
+            df_e['Período'] = period(df_e)
+
+        s1 = lineplot_lod(df_e['Período'], df_e['Total Repassado'], ax, color, entity, errorbar, max_points, method)
+
+    return s1
+
+
+def plot_ts_rfb_many(index, entities, ax, colors, max_points=None, method='lttb'):
+    """Plot time series of several entities from an EntityIndex with a single seaborn call.
+
+    Each series is reduced to the axes resolution (see lineplot_lod) and all of them are drawn by
+    one lineplot with hue='Entidade', so the seaborn setup (axis labels, legend) is done once for
+    the batch. If some entity has more than one row per period, each entity is plotted on its own
+    with plot_ts_rfb instead. Returns ax; nothing is drawn when entities is empty.
+    """
+
+    pairs = list(zip(entities, colors))
+    if not pairs:
+        return ax
+
+    series = [index[entity] for entity, _ in pairs]
+    if not all(df_e.index.is_unique for df_e in series):
+        for entity, color in pairs:
+            plot_ts_rfb(index, entity, ax, color, max_points=max_points, method=method)
+        return ax
+
+    parts = []
+    for (entity, _), df_e in zip(pairs, series):
+        x, y = lod.downsample(df_e.index, df_e['Total Repassado'].to_numpy(), max_points, method, ax)
+        parts.append(DataFrame({'Período': x, 'Total Repassado': y, 'Entidade': entity}))
+
+    return lineplot(data=concat(parts, ignore_index=True), x='Período', y='Total Repassado', hue='Entidade',
+                    hue_order=[e for e, _ in pairs], palette=dict(pairs), estimator=None, errorbar=None,
+                    sort=False, ax=ax)
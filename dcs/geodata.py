@@ -0,0 +1,289 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from geopandas import read_file, read_parquet, GeoSeries
+from shapely import STRtree, coverage_simplify, box, contains_xy, prepare, area as shapely_area
+import numpy as np
+import pyarrow.parquet as pq
+import hashlib, json, os
+
+DATA = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+# converted layers: GeoParquet files, one per source
+CACHE_DIR = os.path.join(DATA, '.geocache')
+
+# cache version: increase whenever the layout of the converted files changes
+CACHE_VERSION = '1'
+CACHE_KEY = b'geodata.source'
+
+# shapefile sources: name -> (path relative to data/, polygons tile the plane without overlaps)
+SOURCES = {'campos': ('ANP_campos_shp/CAMPOS_PRODUCAO_SIRGASPolygon.shp', False),
+           'estados': ('gadm36_BRA_shp/gadm36_BRA_1.shp', True),
+           'municipios_pb': ('PB_Municipios_2021/PB_Municipios_2021.shp', True)}
+
+# shapefile sidecars that change the layer when they change
+SIDECARS = ('.shp', '.shx', '.dbf', '.prj', '.cpg')
+
+# simplification tolerance (degrees) of each level of detail; level 0 is the full geometry
+TOLERANCES = (0.0, 0.002, 0.01, 0.05)
+
+# plot width (pixels) assumed when there is no axes to measure
+PIXELS = 1000
+
+# points per chunk of locate (chunks run in threads: shapely releases the GIL)
+CHUNK_SIZE = 1_000_000
+MAX_WORKERS = os.cpu_count() or 1
+
+# max. grid cells per side over the points of a chunk (unit of the tree queries of locate)
+GRID = 256
+
+
+def _column(level):
+    return 'geometry' if level == 0 else f'geometry_{level}'
+
+
+def source_path(name):
+    if name not in SOURCES:
+        raise ValueError(f'Layers: {list(SOURCES)}. Got: {name}')
+
+    return os.path.join(DATA, SOURCES[name][0])
+
+
+def cache_path(name):
+    return os.path.join(CACHE_DIR, name + '.parquet')
+
+
+def fingerprint(name):
+    """Hash of the shapefile (and sidecars), the tolerances and the cache version."""
+
+    base = os.path.splitext(source_path(name))[0]
+    h = hashlib.sha1(repr((CACHE_VERSION, TOLERANCES, SOURCES[name])).encode())
+    for ext in SIDECARS:
+        if os.path.isfile(base + ext):
+            with open(base + ext, 'rb') as f:
+                h.update(ext.encode() + hashlib.file_digest(f, 'sha1').digest())
+
+    return h.hexdigest()
+
+
+def is_cached(name):
+    """Check whether the converted layer exists and matches its source."""
+
+    file = cache_path(name)
+    if not os.path.isfile(file):
+        return False
+    metadata = pq.read_schema(file).metadata or {}
+
+    return metadata.get(CACHE_KEY) == fingerprint(name).encode()
+
+
+def simplified(geoms, tolerance, coverage):
+    """Geometries simplified to tolerance; shared borders of a coverage are simplified once, so no gaps open between neighbors."""
+
+    if coverage:
+        return GeoSeries(coverage_simplify(geoms.values, tolerance), index=geoms.index, crs=geoms.crs)
+
+    return geoms.simplify(tolerance, preserve_topology=True)
+
+
+def convert(name, force=False):
+    """
+    One-time conversion of a shapefile to GeoParquet.
+
+    Rows are sorted along a Hilbert curve, so neighbors are stored (and indexed) together, and a
+    bbox covering column lets readers skip rows outside an extent. Every level of detail of
+    TOLERANCES is a geometry column of its own, read only when asked for.
+    """
+
+    file = cache_path(name)
+    if not force and is_cached(name):
+        return file
+
+    src = source_path(name)
+    if not os.path.isfile(src):
+        raise FileNotFoundError(f'Shapefile not found: {src}')
+
+    gdf = read_file(src, engine='pyogrio')
+    gdf['geometry'] = gdf.geometry.make_valid()
+    gdf = gdf.iloc[gdf.geometry.hilbert_distance().argsort()].reset_index(drop=True)
+
+    coverage = SOURCES[name][1]
+    for level, tol in enumerate(TOLERANCES[1:], start=1):
+        gdf[_column(level)] = simplified(gdf.geometry, tol, coverage)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    gdf.to_parquet(file + '.part', index=False, write_covering_bbox=True)
+
+    # stamp with the source hash (written after the fact: geopandas owns the 'geo' metadata)
+    table = pq.read_table(file + '.part')
+    table = table.replace_schema_metadata({**table.schema.metadata, CACHE_KEY: fingerprint(name).encode()})
+    pq.write_table(table, file + '.part')
+    os.replace(file + '.part', file)
+    print(f'{name}: {len(gdf)} features converted to {file}')
+
+    return file
+
+
+def level_for(extent, pixels=PIXELS):
+    """Coarsest level whose tolerance is below one pixel of a plot of extent (xmin, ymin, xmax, ymax)."""
+
+    xmin, ymin, xmax, ymax = extent
+    pixel = max(xmax - xmin, ymax - ymin)/pixels
+
+    return max(i for i, tol in enumerate(TOLERANCES) if tol <= pixel)
+
+
+def bounds(name):
+    """(xmin, ymin, xmax, ymax) of a layer, from the GeoParquet metadata."""
+
+    geo = json.loads(pq.read_schema(convert(name)).metadata[b'geo'])
+
+    return tuple(geo['columns']['geometry']['bbox'])
+
+
+def load(name, level=0, columns=None, bbox=None):
+    """
+    Layer as a GeoDataFrame (converted from the shapefile on first use).
+
+    level: level of detail of the geometry (index of TOLERANCES; 0 is full resolution).
+    columns: attribute columns to read (default: all).
+    bbox: (xmin, ymin, xmax, ymax); only features that may intersect it are read.
+    """
+
+    if not 0 <= level < len(TOLERANCES):
+        raise ValueError(f'Levels: 0 to {len(TOLERANCES) - 1}. Got: {level}')
+
+    file = convert(name)
+    geoms = [_column(i) for i in range(len(TOLERANCES))]
+    if columns is None:
+        columns = [c for c in pq.read_schema(file).names if c not in geoms and c != 'bbox']
+
+    gdf = read_parquet(file, columns=list(columns) + [_column(level)], bbox=bbox)
+    if level:
+        gdf = gdf.rename_geometry('geometry')
+
+    return gdf
+
+
+@lru_cache(maxsize=16)
+def tree(name, level=0):
+    """
+    (GeoDataFrame, STRtree) of a layer, built once per process.
+
+    Tree positions are row positions of the frame. The rows are already in Hilbert order, so
+    building the tree costs a sort of the bounding boxes only.
+    """
+
+    gdf = load(name, level)
+    geoms = np.asarray(gdf.geometry.array)
+    prepare(geoms)
+
+    return gdf, STRtree(geoms)
+
+
+def _locate(tree, area, x, y, grid=GRID):
+    """Row of the polygon containing each point (-1: none), for one chunk of coordinates."""
+
+    geoms = tree.geometries
+    out = np.full(len(x), -1, dtype=np.intp)
+    if not len(x):
+        return out
+
+    # points binned into grid cells; the tree is queried with the occupied cells, not the points
+    grid = min(grid, int(np.sqrt(len(x)))//4 + 1) # ~16 points per cell for small chunks
+    x0, y0 = x.min(), y.min()
+    step = max(x.max() - x0, y.max() - y0, 1e-12)/grid
+    cell = np.minimum((x - x0)//step, grid - 1).astype(np.intp)*grid + np.minimum((y - y0)//step, grid - 1).astype(np.intp)
+    cells = np.flatnonzero(np.bincount(cell, minlength=grid*grid))
+    cx, cy = cells//grid*step + x0, cells % grid*step + y0
+    boxes = box(cx, cy, cx + step, cy + step)
+
+    c, p = tree.query(boxes)
+    if not len(c):
+        return out
+    inside = np.zeros(len(c), bool) # cells entirely within a polygon: no point test needed
+    w = tree.query(boxes, predicate='within')
+    inside[np.isin(c*len(geoms) + p, w[0]*len(geoms) + w[1])] = True
+    c = cells[c]
+
+    # only the points of cells that touch some polygon are sorted (by cell) and tested
+    candidate = np.zeros(grid*grid, bool)
+    candidate[c] = True
+    sel = np.flatnonzero(candidate[cell])
+    order = sel[np.argsort(cell[sel], kind='stable')]
+    counts = np.bincount(cell[sel], minlength=grid*grid)
+    starts = np.cumsum(counts) - counts
+
+    # (point, polygon) candidate pairs: every point of the cell against every polygon of the pair
+    n = counts[c]
+    first = np.repeat(starts[c] - (np.cumsum(n) - n), n)
+    pt = order[first + np.arange(n.sum())]
+    poly = np.repeat(p, n)
+    hit = np.repeat(inside, n)
+    hit[~hit] = contains_xy(geoms[poly[~hit]], x[pt[~hit]], y[pt[~hit]])
+    pt, poly = pt[hit], poly[hit]
+
+    # overlapping polygons: the smallest one wins (e.g. a field nested in another)
+    o = np.lexsort((area[poly], pt))
+    pt, poly = pt[o], poly[o]
+    first = np.r_[True, pt[1:] != pt[:-1]]
+    out[pt[first]] = poly[first]
+
+    return out
+
+
+def locate(name, x, y, level=0, chunk_size=CHUNK_SIZE, max_workers=MAX_WORKERS):
+    """
+    Row (of load(name, level)) of the polygon containing each point (x, y), or -1.
+
+    Points are handled as NumPy coordinate arrays, without building a geometry per point. Each
+    chunk is binned in a grid; one bulk STRtree query pairs the occupied cells with the polygons
+    they touch, and only the points of cells not entirely within a polygon are tested (with the
+    prepared polygons). Points outside every polygon, or without coordinates, get -1.
+    """
+
+    gdf, t = tree(name, level)
+    area = shapely_area(t.geometries) # planar, only compared between polygons
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    out = np.full(len(x), -1, dtype=np.intp)
+    ok = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+
+    chunks = [ok[i:i + chunk_size] for i in range(0, len(ok), chunk_size)]
+    run = lambda idx: _locate(t, area, x[idx], y[idx])
+    if len(chunks) > 1 and max_workers > 1:
+        with ThreadPoolExecutor(max_workers) as pool:
+            found = list(pool.map(run, chunks))
+    else:
+        found = [run(idx) for idx in chunks]
+
+    for idx, f in zip(chunks, found):
+        out[idx] = f
+
+    return out
+
+
+def plot(name, ax=None, extent=None, level=None, columns=None, **kw):
+    """
+    Plots a layer at the level of detail that matches the plot resolution.
+
+    extent: (xmin, ymin, xmax, ymax) to show (default: the whole layer); only the features
+            that may intersect it are read.
+    level: forces a level of detail (default: chosen from extent and the axes width in pixels).
+    kw: passed to GeoDataFrame.plot.
+    """
+
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.gca()
+    full = bounds(name)
+    extent = extent or full
+    if level is None:
+        level = level_for(extent, ax.get_window_extent().width)
+
+    # the whole layer: no need to filter rows
+    gdf = load(name, level, columns or [], bbox=None if extent == full else extent)
+    gdf.plot(ax=ax, **kw)
+    ax.set_xlim(extent[0], extent[2])
+    ax.set_ylim(extent[1], extent[3])
+
+    return ax
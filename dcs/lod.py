@@ -0,0 +1,120 @@
+import numpy as np
+
+# points kept per pixel of the axes width (min/max keeps two per bucket, so it draws the
+# same envelope as the raw series at this density)
+POINTS_PER_PIXEL = 2
+
+# target size when there is no axes to measure
+MAX_POINTS = 2000
+
+
+def _numeric(x):
+    """x as float64 (datetimes as integer ticks), for the geometry of the reductions."""
+
+    x = np.asarray(x)
+    if x.dtype.kind in 'mM':
+        return x.view('i8').astype(float)
+
+    return x.astype(float, copy=False)
+
+
+def _buckets(n, size):
+    """Edges of `size` buckets of nearly equal length over n points."""
+
+    return np.linspace(0, n, size + 1).astype(np.intp)
+
+
+def minmax_indices(y, n):
+    """
+    Indices of the min and max of y in n//2 buckets of equal length (in order), so every
+    spike of the series survives. Vectorized: buckets are rows of a padded 2D view.
+    """
+
+    y = np.asarray(y, dtype=float)
+    m = len(y)
+    buckets = max(n//2, 1)
+    if m <= n:
+        return np.arange(m)
+
+    size = -(-m//buckets)
+    pad = np.full(buckets*size, np.nan)
+    pad[:m] = y
+    rows = pad.reshape(buckets, size)
+    valid = ~np.isnan(rows).all(axis=1) # padding (or gaps) may leave whole buckets empty
+    rows, base = rows[valid], np.flatnonzero(valid)*size
+    lo = base + np.nanargmin(rows, axis=1)
+    hi = base + np.nanargmax(rows, axis=1)
+
+    return np.unique(np.r_[lo, hi])
+
+
+def lttb_indices(x, y, n):
+    """
+    Indices of the points kept by Largest-Triangle-Three-Buckets (Steinarsson, 2013): first and
+    last points, plus, in each of n - 2 buckets, the point that makes the largest triangle with
+    the point kept in the previous bucket and the mean of the next one.
+
+    The choice in each bucket depends on the previous one, so buckets are visited in order,
+    but each visit is a NumPy reduction over the whole bucket (the bucket means are computed
+    for all buckets at once).
+    """
+
+    x, y = _numeric(x), np.asarray(y, dtype=float)
+    m = len(x)
+    if m <= n or n < 3:
+        return np.arange(m)
+
+    edges = _buckets(m - 2, n - 2) + 1
+    sums_x, sums_y = np.add.reduceat(x[1:-1], edges[:-1] - 1), np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    mean_x = np.r_[sums_x/counts, x[-1]] # next-bucket anchor; the last bucket looks at the last point
+    mean_y = np.r_[sums_y/counts, y[-1]]
+
+    out = np.empty(n, dtype=np.intp)
+    out[0], out[-1] = 0, m - 1
+    a = 0
+    for b in range(n - 2):
+        s, t = edges[b], edges[b + 1]
+        px, py = x[a], y[a]
+        cx, cy = mean_x[b + 1], mean_y[b + 1]
+        area = np.abs((px - cx)*(y[s:t] - py) - (px - x[s:t])*(cy - py))
+        a = s + int(np.argmax(area))
+        out[b + 1] = a
+
+    return out
+
+
+def indices(x, y, n=None, method='lttb', ax=None):
+    """
+    Indices of the points to draw of a series sorted by x.
+
+    n: points to keep (default: POINTS_PER_PIXEL per pixel of ax, or MAX_POINTS).
+    method: 'lttb' (shape-preserving, n points) or 'minmax' (envelope, up to n points).
+    Missing values of y are left out. Series with at most n points are kept whole.
+    """
+
+    if method not in ('lttb', 'minmax'):
+        raise ValueError(f"method must be 'lttb' or 'minmax', got {method!r}")
+    if n is None:
+        n = int(ax.get_window_extent().width)*POINTS_PER_PIXEL if ax is not None else MAX_POINTS
+
+    y = np.asarray(y, dtype=float)
+    ok = np.isfinite(y)
+    if len(y) <= n:
+        return np.flatnonzero(ok)
+
+    keep = np.flatnonzero(ok) if not ok.all() else None
+    if keep is not None:
+        x, y = np.asarray(x)[keep], y[keep]
+    idx = lttb_indices(x, y, n) if method == 'lttb' else minmax_indices(y, n)
+
+    return idx if keep is None else keep[idx]
+
+
+def downsample(x, y, n=None, method='lttb', ax=None):
+    """(x, y) reduced to about n points (see indices); x and y may be arrays or Series."""
+
+    idx = indices(x, y, n, method, ax)
+    pick = lambda v: v.iloc[idx] if hasattr(v, 'iloc') else np.asarray(v)[idx]
+
+    return pick(x), pick(y)
@@ -0,0 +1,257 @@
+from functools import lru_cache
+from pandas import DataFrame, Series, isna
+import numpy as np
+import h5py, os, warnings
+
+DATA = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+# NEON tower temperature sample (ESA 2014 workshop)
+FILE = os.path.join(DATA, 'NEONDSTowerTemperatureData.hdf5')
+
+# samples merged per bucket from one pyramid level to the next
+FACTOR = 4
+
+# max. points per series drawn by plot (when there is no axes to measure)
+MAX_POINTS = 2000
+
+
+@lru_cache(maxsize=8)
+def _file(path=FILE):
+    """h5py file of this process, opened once (read-only)."""
+
+    return h5py.File(path, 'r')
+
+
+def _parse(dates):
+    """datetime64[ms] of NEON date strings (b'2014-04-01 00:00:00.0')."""
+
+    return np.asarray(dates).astype('U30').astype('datetime64[ms]')
+
+
+@lru_cache(maxsize=8)
+def index(path=FILE):
+    """
+    One row per dataset of the file (domain/site/resolution/sensor/variable), built once per
+    process from the group attributes and the first/last dates of each dataset.
+
+    contiguous: the dataset is stored unchunked and uncompressed, so it is memory-mapped.
+    step: sampling interval of a regularly sampled dataset (NaT otherwise); windows of regular
+          datasets are located by arithmetic, without reading the date column.
+    """
+
+    rows = []
+
+    def visit(name, obj):
+        if not isinstance(obj, h5py.Dataset):
+            return
+        domain, site, resolution, sensor, variable = name.split('/')
+        site_attrs, sensor_attrs = obj.parent.parent.parent.attrs, obj.parent.attrs
+        lat, lon = (float(v) for v in site_attrs.get('LatLon', 'nan/nan').split('/'))
+        plist = obj.id.get_create_plist()
+        n = len(obj)
+        t = _parse(obj.fields('date')[[0, min(1, n - 1), n - 1]]) if n else np.array(['NaT']*3, 'datetime64[ms]')
+        step = t[1] - t[0]
+        rows.append({'domain': domain, 'site': site, 'resolution': resolution, 'sensor': sensor,
+                     'variable': variable, 'path': name, 'length': n,
+                     'height': float(sensor_attrs.get('Sensor Height', 'nan m').split()[0]),
+                     'start': t[0], 'end': t[2],
+                     'step': step if n > 1 and t[0] + step*(n - 1) == t[2] else np.timedelta64('NaT', 'ms'),
+                     'contiguous': plist.get_layout() == h5py.h5d.CONTIGUOUS and plist.get_nfilters() == 0
+                                   and obj.id.get_offset() is not None,
+                     'site_name': site_attrs.get('Site Name'), 'lat': lat, 'lon': lon})
+
+    _file(path).visititems(visit)
+
+    return DataFrame(rows)
+
+
+def entry(site, sensor, resolution='min_1', variable='temperature', path=FILE):
+    """Index row of one dataset."""
+
+    ix = index(path)
+    found = ix[(ix.site == site) & (ix.sensor == sensor) & (ix.resolution == resolution) & (ix.variable == variable)]
+    if found.empty:
+        raise ValueError(f'No dataset {site}/{resolution}/{sensor}/{variable}. Available: {ix.path.tolist()}')
+
+    return found.iloc[0]
+
+
+def site_sensors(site, resolution='min_1', variable='temperature', path=FILE):
+    """Sensors of a site, from the lowest to the highest."""
+
+    ix = index(path)
+    ix = ix[(ix.site == site) & (ix.resolution == resolution) & (ix.variable == variable)]
+
+    return ix.sort_values('height').sensor.tolist()
+
+
+@lru_cache(maxsize=64)
+def _data(name, path=FILE):
+    """Dataset records: a read-only memory map if the dataset is contiguous, else the (lazy) h5py dataset."""
+
+    ds = _file(path)[name]
+    e = index(path).set_index('path').loc[name]
+    if e.contiguous:
+        return np.memmap(path, dtype=ds.dtype, mode='r', offset=ds.id.get_offset(), shape=ds.shape)
+
+    return ds
+
+
+def _field(data, field, s=slice(None)):
+    """One field of a window of records: a view of the memory map, or read from the h5py dataset."""
+
+    if isinstance(data, np.ndarray):
+        return data[field][s]
+
+    return data.fields(field)[s]
+
+
+def _regular(e):
+    """(first time, step) of a regularly sampled index entry, or None."""
+
+    if isna(e.step):
+        return None
+
+    return e.start.to_datetime64().astype('datetime64[ms]'), e.step.to_timedelta64().astype('timedelta64[ms]')
+
+
+@lru_cache(maxsize=64)
+def _dates(name, path=FILE):
+    """Parsed date column of an irregular dataset, read once per process."""
+
+    return _parse(_field(_data(name, path), 'date'))
+
+
+def window(e, start=None, end=None, path=FILE):
+    """Slice of the records of index entry e with start <= time <= end."""
+
+    start = None if start is None else np.datetime64(start, 'ms')
+    end = None if end is None else np.datetime64(end, 'ms')
+    n = e.length
+
+    regular = _regular(e)
+    if regular:
+        t0, step = regular
+        i0 = 0 if start is None else int(np.clip(-((t0 - start)//step), 0, n))
+        i1 = n if end is None else int(np.clip((end - t0)//step + 1, 0, n))
+        return slice(i0, max(i0, i1))
+
+    t = _dates(e.path, path)
+    i0 = 0 if start is None else np.searchsorted(t, start, 'left')
+    i1 = n if end is None else np.searchsorted(t, end, 'right')
+
+    return slice(int(i0), int(max(i0, i1)))
+
+
+def times(e, s=slice(None), path=FILE):
+    """Times of the records s of index entry e (computed, not read, for regular datasets)."""
+
+    regular = _regular(e)
+    if regular:
+        t0, step = regular
+        return t0 + step*np.arange(e.length)[s]
+
+    return _dates(e.path, path)[s]
+
+
+def series(site, sensor, start=None, end=None, field='mean', resolution='min_1', variable='temperature', path=FILE):
+    """
+    (times, values) of one sensor between start and end (inclusive).
+
+    values is a view of the memory-mapped file for contiguous datasets (nothing is read until
+    used; copy it to keep it past the file); other datasets read only the window.
+    """
+
+    e = entry(site, sensor, resolution, variable, path)
+    s = window(e, start, end, path)
+
+    return times(e, s, path), _field(_data(e.path, path), field, s)
+
+
+def frame(site, sensors=None, start=None, end=None, field='mean', resolution='min_1', variable='temperature', path=FILE):
+    """DataFrame of one field of several sensors of a site (default: all, lowest first), indexed by time."""
+
+    out = {}
+    for sensor in sensors or site_sensors(site, resolution, variable, path):
+        t, v = series(site, sensor, start, end, field, resolution, variable, path)
+        out[sensor] = Series(np.array(v), index=t)
+
+    return DataFrame(out).rename_axis('date')
+
+
+@lru_cache(maxsize=64)
+def pyramid(site, sensor, resolution='min_1', variable='temperature', path=FILE):
+    """
+    Min/max/mean pyramid of a series, built once per process.
+
+    Level k merges FACTOR**k records: min of the minima, max of the maxima and the mean weighted
+    by numPts (missing values are skipped). Level 0 is the records themselves. Each level is a
+    dict of arrays ('min', 'max', 'mean', 'n'); the last level has a single bucket.
+    """
+
+    e = entry(site, sensor, resolution, variable, path)
+    data = _data(e.path, path)
+    n = np.asarray(_field(data, 'numPts'), float)
+    mean = np.asarray(_field(data, 'mean'), float)
+    ok = np.isfinite(mean) & (n > 0)
+    level = {'min': np.asarray(_field(data, 'min'), float), 'max': np.asarray(_field(data, 'max'), float),
+             'mean': mean, 'n': np.where(ok, n, 0)}
+    levels = [level]
+    total = np.where(ok, mean*n, 0)
+
+    while len(level['n']) > 1:
+        m = len(level['n'])
+        pad = -m % FACTOR
+        fill = lambda a, v: np.r_[a, np.full(pad, v)].reshape(-1, FACTOR)
+        with np.errstate(invalid='ignore', divide='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning) # all-NaN buckets
+            lo = np.nanmin(fill(level['min'], np.nan), axis=1)
+            hi = np.nanmax(fill(level['max'], np.nan), axis=1)
+            cnt = fill(level['n'], 0).sum(axis=1)
+            total = fill(total, 0).sum(axis=1)
+            level = {'min': lo, 'max': hi, 'mean': np.where(cnt > 0, total/cnt, np.nan), 'n': cnt}
+        levels.append(level)
+
+    return levels
+
+
+def downsample(site, sensor, start=None, end=None, max_points=MAX_POINTS, resolution='min_1', variable='temperature', path=FILE):
+    """
+    (times, mean, min, max) of a window at the finest pyramid level with at most max_points
+    buckets; times are the start of each bucket.
+    """
+
+    e = entry(site, sensor, resolution, variable, path)
+    s = window(e, start, end, path)
+    levels = pyramid(site, sensor, resolution, variable, path)
+
+    k = 0
+    while k < len(levels) - 1 and -(-(s.stop - s.start)//FACTOR**k) > max_points:
+        k += 1
+    b = slice(s.start//FACTOR**k, -(-s.stop//FACTOR**k))
+    level = levels[k]
+    t = times(e, slice(b.start*FACTOR**k, b.stop*FACTOR**k, FACTOR**k), path)
+
+    return t, level['mean'][b], level['min'][b], level['max'][b]
+
+
+def plot(site, sensors=None, start=None, end=None, ax=None, max_points=None, resolution='min_1', variable='temperature',
+         path=FILE, band=True, **kw):
+    """
+    Plots the mean of the sensors of a site (default: all) with the min/max band, each series
+    reduced to about one bucket per pixel of the axes.
+
+    kw: passed to ax.plot.
+    """
+
+    import matplotlib.pyplot as plt
+
+    ax = ax or plt.gca()
+    max_points = max_points or int(ax.get_window_extent().width) or MAX_POINTS
+    for sensor in sensors or site_sensors(site, resolution, variable, path):
+        t, mean, lo, hi = downsample(site, sensor, start, end, max_points, resolution, variable, path)
+        line, = ax.plot(t, mean, label=f'{sensor} ({entry(site, sensor, resolution, variable, path).height:g} m)', **kw)
+        if band:
+            ax.fill_between(t, lo, hi, color=line.get_color(), alpha=0.2, lw=0)
+
+    return ax
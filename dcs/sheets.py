@@ -0,0 +1,220 @@
+from openpyxl import load_workbook
+import pyarrow as pa, pyarrow.compute as pc, pyarrow.parquet as pq
+import hashlib, os, tempfile
+
+DATA = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data'))
+
+# converted sheets: one Parquet file per (workbook, sheet)
+CACHE_DIR = os.path.join(DATA, '.xlsxcache')
+
+# cache version: increase whenever the conversion rules (types, names) change
+CACHE_VERSION = '1'
+CACHE_KEY = b'sheets.source'
+
+# rows converted at a time while streaming a sheet (also the Parquet row group size)
+BATCH_SIZE = 50_000
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha1').hexdigest()
+
+
+def cache_path(path, sheet_name=0):
+    """Cache file of a sheet; the name carries a hash of the workbook path, so equal names in different folders don't clash."""
+
+    path = os.path.abspath(path)
+    stem = os.path.splitext(os.path.basename(path))[0]
+    where = hashlib.sha1(path.encode()).hexdigest()[:8]
+
+    return os.path.join(CACHE_DIR, f'{stem}-{where}.{sheet_name}.parquet')
+
+
+def stamp(path):
+    return f'{CACHE_VERSION}:{digest(path)}'.encode()
+
+
+def is_cached(path, sheet_name=0):
+    """Check whether the sheet was converted from the current contents of the workbook."""
+
+    file = cache_path(path, sheet_name)
+    if not os.path.isfile(file):
+        return False
+    metadata = pq.read_schema(file).metadata or {}
+
+    return metadata.get(CACHE_KEY) == stamp(path)
+
+
+def _value(cell):
+    """Cell value as pandas.read_excel reads it: integral numbers as int, errors and blanks as null."""
+
+    v = cell.value
+    if v is None or cell.data_type == 'e':
+        return None
+    if cell.data_type == 'n':
+        i = int(v)
+        return i if i == v else float(v)
+
+    return v
+
+
+def _names(header):
+    """Column names from the header row, named and deduplicated like pandas ('Unnamed: 3', 'X.1')."""
+
+    names, seen = [], {}
+    for i, v in enumerate(header):
+        name = f'Unnamed: {i}' if v is None else str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        seen.setdefault(name, 0)
+        names.append(name)
+
+    return names
+
+
+def _array(values):
+    """Arrow array of one column of a batch; a column mixing text with other types becomes text."""
+
+    try:
+        return pa.array(values)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return pa.array([None if v is None else str(v) for v in values], pa.string())
+
+
+def _batch(rows, names):
+    width = len(names)
+    columns = list(zip(*(r + (None,)*(width - len(r)) for r in rows)))
+
+    return pa.table([_array(list(c)) for c in columns], names=names)
+
+
+def _spill(table, scratch, parts):
+    """Write a batch to its own scratch Parquet file (batches may still disagree on types)."""
+
+    part = os.path.join(scratch, f'{len(parts):06d}.parquet')
+    pq.write_table(table, part)
+    parts.append(part)
+
+
+def _text(col):
+    return col if pa.types.is_string(col.type) else pc.cast(col, pa.string())
+
+
+def _castable(col, t):
+    try:
+        pc.utf8_trim_whitespace(_text(col)).cast(t)
+        return True
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        return False
+
+
+def _schema(parts):
+    """
+    Types read_excel would infer for the whole sheet, from the scratch batches:
+    - a column typed differently across batches becomes text, unless all its types are numeric
+      (then int64, or float64 if some batch has floats);
+    - numbers stored as text become numbers (checked batch by batch, one column at a time);
+    - empty columns become float.
+    """
+
+    schemas = [pq.read_schema(p) for p in parts]
+    fields = []
+    for i, name in enumerate(schemas[0].names):
+        types = {s.field(i).type for s in schemas} - {pa.null()}
+        if not types:
+            t = pa.float64()
+        elif all(pa.types.is_integer(t) or pa.types.is_floating(t) for t in types):
+            t = pa.float64() if any(pa.types.is_floating(t) for t in types) else pa.int64()
+        elif len(types) == 1 and not pa.types.is_string(next(iter(types))):
+            t = next(iter(types))
+        else:
+            t = pa.string()
+            for number in (pa.int64(), pa.float64()):
+                if all(_castable(pq.read_table(p, columns=[name])[name], number) for p in parts):
+                    t = number
+                    break
+        fields.append(pa.field(name, t))
+
+    return pa.schema(fields)
+
+
+def _cast(table, schema):
+    """Batch cast to the sheet schema (text to numbers after trimming whitespace)."""
+
+    columns = []
+    for col, f in zip(table.columns, schema):
+        if pa.types.is_string(f.type):
+            col = _text(col)
+        elif pa.types.is_string(col.type):
+            col = pc.utf8_trim_whitespace(col).cast(f.type)
+        columns.append(col.cast(f.type))
+
+    return pa.table(columns, schema=schema)
+
+
+def convert(path, sheet_name=0, batch_size=BATCH_SIZE):
+    """
+    One-time conversion of a workbook sheet to Parquet.
+
+    The sheet is streamed (openpyxl read-only mode) and turned into Arrow columns batch_size rows
+    at a time. Each batch is spilled to a scratch Parquet file; once the whole sheet is seen, the
+    column types are settled (_schema) and the batches are cast and written one at a time through a
+    ParquetWriter. Memory is bounded by one batch: neither the workbook, nor the rows as Python
+    objects, nor the converted table are ever fully in memory. The file is stamped with the
+    workbook hash.
+    """
+
+    file = cache_path(path, sheet_name)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    with tempfile.TemporaryDirectory(dir=CACHE_DIR) as scratch:
+        parts = []
+        wb = load_workbook(path, read_only=True, data_only=True, keep_links=False)
+        try:
+            ws = wb.worksheets[sheet_name] if isinstance(sheet_name, int) else wb[sheet_name]
+            ws.reset_dimensions() # stored dimensions may be wrong: read up to the last row
+            rows = ws.iter_rows()
+            names = _names([_value(c) for c in next(rows, ())])
+
+            batch, blank = [], 0
+            for row in rows:
+                values = tuple(_value(c) for c in row[:len(names)])
+                if all(v is None for v in values): # held back: trailing blank rows are dropped, as by read_excel
+                    blank += 1
+                    continue
+                batch.extend([()]*blank + [values])
+                blank = 0
+                if len(batch) >= batch_size:
+                    _spill(_batch(batch, names), scratch, parts)
+                    batch = []
+            if batch or not parts:
+                _spill(_batch(batch, names) if batch else pa.table({n: pa.nulls(0) for n in names}), scratch, parts)
+        finally:
+            wb.close()
+
+        schema = _schema(parts).with_metadata({CACHE_KEY: stamp(path)})
+        with pq.ParquetWriter(file + '.part', schema) as writer:
+            for part in parts:
+                writer.write_table(_cast(pq.read_table(part), schema), row_group_size=batch_size)
+
+    os.replace(file + '.part', file)
+
+    return file
+
+
+def read_xlsx(path, columns=None, sheet_name=0, batch_size=BATCH_SIZE):
+    """
+    Sheet of an Excel workbook as a DataFrame, read from a Parquet cache.
+
+    The sheet is converted on first use and again whenever the workbook changes (by content
+    hash). Only the columns asked for are read from the cache.
+
+    columns: list of columns to read (default: all).
+    sheet_name: sheet index or name (default: the first sheet).
+    """
+
+    if not is_cached(path, sheet_name):
+        convert(path, sheet_name, batch_size)
+
+    return pq.read_table(cache_path(path, sheet_name), columns=columns).to_pandas()
@@ -1,24 +1,83 @@
-from dash import Dash, html, dcc, callback, Output, Input
+from dash import Dash, html, dcc, callback, clientside_callback, Output, Input, State
+from functools import lru_cache
 import plotly.express as px
 import pandas as pd
+import os
+import shared
 
-df = pd.read_csv('https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv')
+URL = 'https://raw.githubusercontent.com/plotly/datasets/master/gapminder_unfiltered.csv'
+
+# local columnar snapshot (Arrow IPC, memory-mapped; created on first run)
+SNAPSHOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'gapminder_unfiltered.arrow')
+
+# max. number of figures kept in memory
+FIGURE_CACHE_SIZE = 256
+
+
+def load_data(snapshot=SNAPSHOT):
+    """Load gapminder from the local snapshot; download it (or use plotly's bundled copy) otherwise."""
+
+    if not os.path.isfile(snapshot):
+        try:
+            shared.write_arrow(pd.read_csv(URL), snapshot)
+        except OSError as e:
+            print(f'Unable to download {URL} ({e}). Using the gapminder data bundled with plotly.')
+            return px.data.gapminder()
+
+    return shared.read_arrow(snapshot)
+
+
+df = load_data()
+
+# rows pre-partitioned by country
+by_country = {c: g for c, g in df.groupby('country', sort=False)}
+
+
+@lru_cache(maxsize=FIGURE_CACHE_SIZE)
+def country_figure(value):
+    """Figure of one country, built once and reused."""
+
+    return px.line(by_country.get(value, df.iloc[:0]), x='year', y='pop')
+
+
+# series of every country as typed arrays, sent once ('clientside') or one at a time ('patch')
+series = shared.series_store(by_country.items(), 'year', 'pop')
 
 app = Dash(__name__)
 
 app.layout = html.Div([
     html.H1(children='Title of Dash App', style={'textAlign':'center'}),
     dcc.Dropdown(df.country.unique(), 'Canada', id='dropdown-selection'),
-    dcc.Graph(id='graph-content')
+    dcc.Graph(id='graph-content', figure=country_figure('Canada')),
+    dcc.Store(id='series', data=series if shared.UPDATES == 'clientside' else None)
 ])
 
-@callback(
-    Output('graph-content', 'figure'),
-    Input('dropdown-selection', 'value')
-)
-def update_graph(value):
-    dff = df[df.country==value]
-    return px.line(dff, x='year', y='pop')
+if shared.UPDATES == 'clientside':
+    clientside_callback(
+        shared.SWITCH_SERIES,
+        Output('graph-content', 'figure'),
+        Input('dropdown-selection', 'value'),
+        State('series', 'data'),
+        State('graph-content', 'figure'),
+        prevent_initial_call=True
+    )
+
+elif shared.UPDATES == 'patch':
+    @callback(
+        Output('graph-content', 'figure'),
+        Input('dropdown-selection', 'value'),
+        prevent_initial_call=True
+    )
+    def update_graph(value):
+        return shared.patch_figure(series.get(value, {'trace': {'x': [], 'y': []}}))
+
+else:
+    @callback(
+        Output('graph-content', 'figure'),
+        Input('dropdown-selection', 'value')
+    )
+    def update_graph(value):
+        return country_figure(value)
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
\ No newline at end of file
+    app.run(debug=True)
@@ -1,12 +1,121 @@
 # boilerplate Dash
-from dash import Dash, html, dcc, dash_table, callback, Output, Input
+from dash import Dash, html, dcc, dash_table, callback, clientside_callback, Output, Input, State
+from functools import lru_cache
 import dash_bootstrap_components as dbc
 import plotly.express as px
 import pandas as pd
-import os
+import numpy as np
+import os, re
+import shared
 
-# dataframe
-df = pd.read_csv('../data/crimes-pb-2015-2018.csv')
+# dataframe (memory-mapped Arrow copy of the CSV, shared by server workers)
+CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data', 'crimes-pb-2015-2018.csv')
+df = shared.mapped_frame(CSV.replace('.csv', '.arrow'), lambda: pd.read_csv(CSV), source=CSV)
+
+# tamanho de página da tabela
+PAGE_SIZE = 6
+
+# operadores da sintaxe de filtro do DataTable
+OPERATORS = [('>=', 'ge'), ('<=', 'le'), ('<', 'lt'), ('>', 'gt'), ('!=', 'ne'), ('=', 'eq'), ('contains', 'contains')]
+
+# termo de filtro: coluna entre chaves, seguida de operador e valor
+FILTER_TERM = re.compile(r'\s*\{(?P<col>[^}]*)\}\s*(?P<rest>.*)', re.S)
+
+# variáveis do histograma pré-agregadas por bairro (soma, como em px.histogram com y)
+HIST_COLS = ['Prevalência','Arma de fogo','Arma branca','Outros']
+df_hist = df.groupby('Bairros', sort=False)[HIST_COLS].sum().reset_index()
+
+
+def parse_filter(part):
+    """
+    Separa um termo de filtro do DataTable ('{col} op valor') em (coluna, operador, valor).
+
+    A coluna é lida primeiro, entre chaves, e o operador só no início do resto do termo, de modo
+    que '<', '=', 'ne ' etc. no nome da coluna ou no valor não deslocam a separação. O valor volta
+    como texto (sem aspas); row_order o converte para o tipo da coluna.
+    """
+
+    m = FILTER_TERM.fullmatch(part)
+    if m is None:
+        return None, None, None
+
+    rest = m['rest']
+    for op, word in OPERATORS:
+        for token in (word + ' ', op):
+            if rest.startswith(token):
+                value = rest[len(token):].strip()
+                if len(value) > 1 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+                    value = value[1:-1]
+                return m['col'], word, value
+
+    return None, None, None
+
+
+def coerce(s, value):
+    """Valor do filtro no tipo da coluna s, ou None se não couber nele (o termo é ignorado, como no filtro nativo)."""
+
+    if pd.api.types.is_numeric_dtype(s):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+
+    return value
+
+
+@lru_cache(maxsize=64)
+def row_order(filter_query, sort_by):
+    """Posições das linhas após filtro e ordenação, calculadas uma vez por combinação."""
+
+    mask = np.ones(len(df), dtype=bool)
+    for part in filter(None, (filter_query or '').split(' && ')):
+        col, op, value = parse_filter(part)
+        if col not in df:
+            continue
+        s = df[col]
+        if op == 'contains':
+            mask &= s.astype(str).str.contains(value, regex=False).to_numpy()
+            continue
+        value = coerce(s, value)
+        if value is None:
+            continue
+        mask &= {'ge': s >= value, 'le': s <= value, 'lt': s < value, 'gt': s > value,
+                 'ne': s != value, 'eq': s == value}[op].to_numpy()
+
+    # ordenação por todas as chaves de uma vez (lexsort é estável; a primeira chave vai por último);
+    # chaves 'desc' entram com o posto negado, o que preserva o desempate das demais
+    rows = np.flatnonzero(mask)
+    keys = []
+    for col, direction in reversed(sort_by):
+        rank, values = pd.factorize(df[col].to_numpy()[rows], sort=True)
+        key = -rank if direction == 'desc' else rank
+        key[rank < 0] = len(values) # valores faltantes por último
+        keys.append(key)
+    if keys:
+        rows = rows[np.lexsort(keys)]
+
+    return rows
+
+
+@lru_cache(maxsize=len(HIST_COLS))
+def hist_figure(col_chosen):
+    """Histograma sobre os dados pré-agregados, construído uma vez por variável."""
+
+    return px.histogram(df_hist, x='Bairros', y=col_chosen)
+
+
+def hist_entry(col_chosen):
+    """O que muda no histograma entre variáveis: valores y, hovertemplate e eixo y."""
+
+    fig = hist_figure(col_chosen)
+
+    return {'trace': {'y': shared.typed_array(df_hist[col_chosen].to_numpy()),
+                      'hovertemplate': fig.data[0].hovertemplate},
+            'layout': {'yaxis': fig.layout.yaxis.to_plotly_json()}}
+
+
+# variáveis do histograma em arrays tipados, enviadas uma vez ('clientside') ou sob demanda ('patch')
+hist_store = {c: hist_entry(c) for c in HIST_COLS}
 
 # instanciamento
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
@@ -31,7 +140,16 @@ app.layout = html.Div([
     ]),
     html.Hr(),
     html.H2('Tabela',style={'color':'#117029'}),
-    dash_table.DataTable(data=df.to_dict('records'), page_size=6),
+    dash_table.DataTable(id='Tbl1',
+                         columns=[{'name': c, 'id': c} for c in df.columns],
+                         page_current=0,
+                         page_size=PAGE_SIZE,
+                         page_action='custom',
+                         sort_action='custom',
+                         sort_mode='multi',
+                         sort_by=[],
+                         filter_action='custom',
+                         filter_query=''),
     html.Hr(),
     html.H2('Seleção de Variáveis para Histograma', style={'color':'#117029'}),
     dcc.RadioItems(options=['Prevalência',
@@ -39,22 +157,56 @@ app.layout = html.Div([
                             'Outros'], 
                    value='Arma de fogo', 
                    id='RdBtn1'),
-    dcc.Graph(figure={},id='Grph1'),
+    dcc.Graph(figure=hist_figure('Arma de fogo'),id='Grph1'),
+    dcc.Store(id='Hist1', data=hist_store if shared.UPDATES == 'clientside' else None),
     html.Hr(),
     html.H5('UFPB | CDIA | DATAVIZ | Ano 2023',style={'textAlign':'center','color':'#117029'}),
     ])
 
-# callback
+# callbacks
 @callback(
-    Output(component_id='Grph1', component_property='figure'),
-    Input(component_id='RdBtn1', component_property='value')
+    Output(component_id='Tbl1', component_property='data'),
+    Output(component_id='Tbl1', component_property='page_count'),
+    Input(component_id='Tbl1', component_property='page_current'),
+    Input(component_id='Tbl1', component_property='page_size'),
+    Input(component_id='Tbl1', component_property='sort_by'),
+    Input(component_id='Tbl1', component_property='filter_query')
 )
-def update_graph(col_chosen):
-    fig = px.histogram(df, x='Bairros', y=col_chosen)
-    return fig
+def update_table(page_current, page_size, sort_by, filter_query):
+    rows = row_order(filter_query, tuple((s['column_id'], s['direction']) for s in sort_by or []))
+    page = rows[page_current*page_size:(page_current + 1)*page_size]
+    return df.iloc[page].to_dict('records'), max(1, -(-len(rows) // page_size))
+
+
+if shared.UPDATES == 'clientside':
+    clientside_callback(
+        shared.SWITCH_SERIES,
+        Output(component_id='Grph1', component_property='figure'),
+        Input(component_id='RdBtn1', component_property='value'),
+        State(component_id='Hist1', component_property='data'),
+        State(component_id='Grph1', component_property='figure'),
+        prevent_initial_call=True
+    )
+
+elif shared.UPDATES == 'patch':
+    @callback(
+        Output(component_id='Grph1', component_property='figure'),
+        Input(component_id='RdBtn1', component_property='value'),
+        prevent_initial_call=True
+    )
+    def update_graph(col_chosen):
+        return shared.patch_figure(hist_store[col_chosen])
+
+else:
+    @callback(
+        Output(component_id='Grph1', component_property='figure'),
+        Input(component_id='RdBtn1', component_property='value')
+    )
+    def update_graph(col_chosen):
+        return hist_figure(col_chosen)
 
 # execução
 # > python dcs28.py
 if __name__ == '__main__':
-    app.run_server(debug=True,
-                   port=os.getenv('PORT',8090))
+    app.run(debug=True,
+            port=os.getenv('PORT',8090))
@@ -0,0 +1,72 @@
+"""
+Load test for Dash callbacks: fires concurrent callback requests and reports latency percentiles.
+
+Usage (with the app running, e.g. `python dw1a.py`):
+    python loadtest.py --url http://127.0.0.1:8050 --output graph-content.figure \
+                       --input dropdown-selection.value --values Canada Brazil Chile \
+                       --users 20 --requests 500
+"""
+import argparse, random, time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+
+def payload(output: str, input: str, value):
+    """Body of a Dash callback request with a single input."""
+
+    oid, oprop = output.split('.')
+    iid, iprop = input.split('.')
+
+    return {'output': output,
+            'outputs': {'id': oid, 'property': oprop},
+            'inputs': [{'id': iid, 'property': iprop, 'value': value}],
+            'changedPropIds': [input],
+            'state': []}
+
+
+def run(url: str, output: str, input: str, values: list, users=10, requests_=200, seed=0):
+    """Send requests_ callback requests from users concurrent clients. Returns latencies (s) and errors."""
+
+    rng = random.Random(seed)
+    bodies = [payload(output, input, rng.choice(values)) for _ in range(requests_)]
+    endpoint = url.rstrip('/') + '/_dash-update-component'
+
+    def one(session, body):
+        t = time.perf_counter()
+        r = session.post(endpoint, json=body)
+        return time.perf_counter() - t, r.status_code
+
+    def client(chunk):
+        with requests.Session() as s:
+            return [one(s, b) for b in chunk]
+
+    chunks = [bodies[i::users] for i in range(users)]
+    with ThreadPoolExecutor(users) as pool:
+        results = [r for rs in pool.map(client, chunks) for r in rs]
+
+    lat = np.array([t for t, status in results if status == 200])
+    errors = sum(status != 200 for _, status in results)
+
+    return lat, errors
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Dash callback load test')
+    parser.add_argument('--url', default='http://127.0.0.1:8050')
+    parser.add_argument('--output', default='graph-content.figure')
+    parser.add_argument('--input', default='dropdown-selection.value')
+    parser.add_argument('--values', nargs='+', default=['Canada', 'Brazil', 'Chile', 'Japan', 'France'])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    t = time.perf_counter()
+    lat, errors = run(args.url, args.output, args.input, args.values, args.users, args.requests)
+    wall = time.perf_counter() - t
+
+    print(f'requests: {args.requests} ({errors} errors), users: {args.users}, throughput: {args.requests / wall:.1f} req/s')
+    if len(lat):
+        p50, p99 = np.percentile(lat, [50, 99]) * 1000
+        print(f'latency p50: {p50:.1f} ms, p99: {p99:.1f} ms, max: {lat.max() * 1000:.1f} ms')
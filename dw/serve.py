@@ -0,0 +1,103 @@
+"""
+Production entry point for the Dash apps in dw/.
+
+Runs an app under gunicorn with several worker processes. The app (and its data) is loaded
+once in the master process before forking (preload), responses are compressed and two
+endpoints are added:
+
+    /health   -> {"status": "ok"}
+    /metrics  -> request count, mean/max latency and uptime of the worker that answers
+
+Usage:
+    python serve.py dw1a --workers 4 --port 8050
+    python serve.py dw1b --workers 4 --port 8090
+
+Figure updates follow DW_UPDATES (see shared.py): clientside (default), patch or figure.
+"""
+import argparse, importlib, os, sys, threading, time
+from flask import g, jsonify, request
+from flask_compress import Compress
+from gunicorn.app.base import BaseApplication
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def create(name: str):
+    """Import a Dash app module from dw/ and return its Flask server ready for production."""
+
+    module = importlib.import_module(name)
+    server = module.app.server
+
+    Compress(server)
+
+    started = time.time()
+    stats = {'requests': 0, 'errors': 0, 'latency_sum': 0.0, 'latency_max': 0.0}
+    lock = threading.Lock()
+
+    @server.before_request
+    def _start():
+        g.t0 = time.perf_counter()
+
+    @server.after_request
+    def _count(response):
+        if request.path not in ('/health', '/metrics'):
+            dt = time.perf_counter() - g.t0
+            with lock:
+                stats['requests'] += 1
+                stats['errors'] += response.status_code >= 500
+                stats['latency_sum'] += dt
+                stats['latency_max'] = max(stats['latency_max'], dt)
+        return response
+
+    @server.route('/health')
+    def health():
+        return jsonify(status='ok')
+
+    @server.route('/metrics')
+    def metrics():
+        n = stats['requests']
+        return jsonify(app=name, pid=os.getpid(), uptime=time.time() - started,
+                       requests=n, errors=stats['errors'],
+                       latency_mean=stats['latency_sum'] / n if n else 0.0,
+                       latency_max=stats['latency_max'])
+
+    # Dash registers its callbacks on the first request; do it here, before the workers fork,
+    # so concurrent first requests in a fresh worker don't race against that setup
+    server.test_client().get('/health')
+
+    return server
+
+
+class Server(BaseApplication):
+    """Gunicorn application with the Dash server preloaded in the master process."""
+
+    def __init__(self, server, options):
+        self.server, self.options = server, options
+        super().__init__()
+
+    def load_config(self):
+        for k, v in self.options.items():
+            self.cfg.set(k, v)
+
+    def load(self):
+        return self.server
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Serve a Dash app from dw/ with gunicorn')
+    parser.add_argument('app', choices=['dw1a', 'dw1b'])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', 8050)))
+    parser.add_argument('--workers', type=int, default=(os.cpu_count() or 1) + 1)
+    parser.add_argument('--threads', type=int, default=4)
+    args = parser.parse_args()
+
+    # data paths of the apps are relative to dw/
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+    Server(create(args.app), {'bind': f'{args.host}:{args.port}',
+                              'workers': args.workers,
+                              'threads': args.threads,
+                              'worker_class': 'gthread',
+                              'preload_app': True}).run()
@@ -0,0 +1,86 @@
+"""
+Read-only data shared between the Dash apps' worker processes and their browser clients.
+
+Frames are stored as Arrow IPC files and opened through a memory map, so every worker
+reads the same pages from the OS page cache instead of holding its own parsed copy.
+
+Series sent to the browser are encoded as plotly.js typed arrays (base64 'bdata'), which
+Plotly decodes directly, so a dcc.Store can ship every series once in compact form.
+"""
+import base64, os
+import numpy as np
+import pyarrow as pa
+from dash import Patch
+
+# how the apps update their figures: 'clientside' (series shipped once in a dcc.Store and
+# switched in the browser), 'patch' (server sends only the new trace arrays) or 'figure'
+# (server sends the whole figure on every interaction)
+UPDATES = os.getenv('DW_UPDATES', 'clientside')
+
+
+def write_arrow(df, path: str):
+    """Store dataframe as an Arrow IPC file (atomic write)."""
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(path + '.part', 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(path + '.part', path)
+
+
+def read_arrow(path: str):
+    """Dataframe backed by a memory-mapped Arrow IPC file (zero-copy for numeric columns without nulls)."""
+
+    table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+
+    return table.to_pandas(split_blocks=True)
+
+
+def mapped_frame(path: str, loader, source=None):
+    """Memory-mapped dataframe at path, built with loader() when missing or older than the source file."""
+
+    if not os.path.isfile(path) or (source and os.path.getmtime(source) > os.path.getmtime(path)):
+        write_arrow(loader(), path)
+
+    return read_arrow(path)
+
+
+def typed_array(values):
+    """plotly.js typed array spec {'dtype', 'bdata'} of a numeric sequence (int64 narrowed to int32 when it fits)."""
+
+    a = np.asarray(values)
+    if a.dtype.kind in 'iu' and (len(a) == 0 or (a.min() >= -2**31 and a.max() < 2**31)):
+        a = a.astype('<i4')
+    else:
+        a = a.astype('<f8')
+
+    return {'dtype': 'i4' if a.dtype.kind == 'i' else 'f8', 'bdata': base64.b64encode(a.tobytes()).decode('ascii')}
+
+
+def series_store(groups, x: str, y: str):
+    """Store entries {key: {'trace': {'x', 'y'}}} for (key, frame) pairs, e.g. a groupby."""
+
+    return {str(k): {'trace': {'x': typed_array(g[x].to_numpy()), 'y': typed_array(g[y].to_numpy())}} for k, g in groups}
+
+
+def patch_figure(entry):
+    """Partial figure update with the trace and layout properties of a store entry."""
+
+    p = Patch()
+    for k, v in entry.get('trace', {}).items():
+        p['data'][0][k] = v
+    for k, v in entry.get('layout', {}).items():
+        p['layout'][k] = v
+
+    return p
+
+
+# clientside callback (key, store, figure) -> figure with the store entry merged into the first
+# trace and the layout; unknown keys (e.g. a cleared dropdown) give an empty trace
+SWITCH_SERIES = """
+function(key, store, figure) {
+    const entry = store[key] || {trace: {x: [], y: []}};
+    const trace = Object.assign({}, figure.data[0], entry.trace);
+    const layout = Object.assign({}, figure.layout, entry.layout || {});
+    return Object.assign({}, figure, {data: [trace], layout: layout});
+}
+"""
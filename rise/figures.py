@@ -0,0 +1,182 @@
+"""
+Pre-rendered figures of the aux*.py scripts used by the RISE decks.
+
+Each aux script is a named figure. Scripts run with matplotlib defaults (plus an optional
+style sheet), fixed seeds and the Agg backend, in a process pool. Their PNG/SVG outputs are
+cached in figs/cache/ under a key that hashes the script source (and the local modules it
+imports), the style sheet and the versions of the plotting libraries, so a deck only shows
+an image file unless something that affects the figure changed.
+
+In a deck:
+    import figures; figures.show('aux06a')
+
+From the shell (render everything that is stale):
+    python figures.py
+    python figures.py aux04a2 aux06a --force
+"""
+import argparse, ast, glob, hashlib, os, runpy, sys
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version, PackageNotFoundError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CACHE = os.path.join(HERE, 'figs', 'cache')
+
+# figure name -> script
+FIGURES = {os.path.basename(p)[:-3]: p for p in sorted(glob.glob(os.path.join(HERE, 'aux*.py')))}
+
+# style sheet applied over matplotlib defaults (None: defaults only, as the decks always ran)
+STYLE = None
+
+FORMATS = ('png', 'svg')
+DPI = 150
+
+# libraries whose version changes the rendered output
+LIBRARIES = ('matplotlib', 'numpy', 'scipy', 'seaborn')
+
+SEED = 0
+
+
+def versions():
+    out = {}
+    for lib in LIBRARIES:
+        try:
+            out[lib] = version(lib)
+        except PackageNotFoundError:
+            out[lib] = None
+
+    return out
+
+
+def sources(path, seen=None):
+    """The script and the local modules (from rise/) it imports, recursively."""
+
+    seen = [] if seen is None else seen
+    seen.append(path)
+    with open(path, 'rb') as f:
+        tree = ast.parse(f.read())
+    for node in ast.walk(tree):
+        names = [a.name for a in node.names] if isinstance(node, ast.Import) else \
+                [node.module] if isinstance(node, ast.ImportFrom) and node.module else []
+        for m in names:
+            local = os.path.join(HERE, m.split('.')[0] + '.py')
+            if os.path.isfile(local) and local not in seen:
+                sources(local, seen)
+
+    return seen
+
+
+def figure_key(name, style=STYLE):
+    """Hash of the script (and local modules) source, the style sheet, the render settings and the library versions."""
+
+    h = hashlib.sha1(repr((sorted(versions().items()), FORMATS, DPI, SEED)).encode())
+    for path in sources(FIGURES[name]):
+        with open(path, 'rb') as f:
+            h.update(f.read())
+    if style:
+        with open(style, 'rb') as f:
+            h.update(f.read())
+
+    return h.hexdigest()[:16]
+
+
+def paths(name, key, formats=FORMATS):
+    return {fmt: os.path.join(CACHE, f'{name}.{key}.{fmt}') for fmt in formats}
+
+
+def cached(name, key, formats=FORMATS):
+    return all(os.path.isfile(p) for p in paths(name, key, formats).values())
+
+
+def render_one(name, key, style=STYLE, formats=FORMATS):
+    """Run one aux script and save the figure it creates. Returns the output paths."""
+
+    import matplotlib
+    import matplotlib.pyplot as plt
+    import numpy as np
+
+    before = set(plt.get_fignums())
+    with matplotlib.rc_context():
+        matplotlib.rcdefaults()
+        matplotlib.rcParams['svg.hashsalt'] = name # stable ids in the SVG
+        if style:
+            plt.style.use(style)
+        np.random.seed(SEED)
+        if HERE not in sys.path:
+            sys.path.insert(0, HERE)
+        runpy.run_path(FIGURES[name], run_name=name)
+
+        new = [n for n in plt.get_fignums() if n not in before]
+        if not new:
+            raise RuntimeError(f'{name} did not create a figure')
+        fig = plt.figure(new[-1])
+
+        os.makedirs(CACHE, exist_ok=True)
+        out = paths(name, key, formats)
+        for fmt, path in out.items():
+            fig.savefig(path + '.part', format=fmt, dpi=DPI, bbox_inches='tight',
+                        metadata={'Software': None} if fmt == 'png' else {'Date': None, 'Creator': None})
+            os.replace(path + '.part', path)
+
+        for n in new: # don't leave the figures behind (e.g. for the inline backend to display)
+            plt.close(n)
+
+    # previous renders of this figure
+    for old in glob.glob(os.path.join(CACHE, f'{name}.*')):
+        if old not in out.values():
+            os.remove(old)
+
+    return out
+
+
+def _init_worker():
+    import matplotlib
+    matplotlib.use('Agg')
+
+
+def _render(args):
+    return render_one(*args)
+
+
+def render(names=None, force=False, workers=None, style=STYLE, formats=FORMATS):
+    """Render the stale figures (all registered figures by default) with Agg in a process pool. Returns {name: paths}."""
+
+    names = list(FIGURES) if names is None else list(names)
+    keys = {n: figure_key(n, style) for n in names}
+    stale = [n for n in names if force or not cached(n, keys[n], formats)]
+
+    # always in worker processes, even for one figure, so the output never depends on the
+    # backend or rcParams of the calling process (e.g. a notebook kernel)
+    if stale:
+        with ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(stale)), initializer=_init_worker) as pool:
+            list(pool.map(_render, [(n, keys[n], style, formats) for n in stale]))
+
+    return {n: paths(n, keys[n], formats) for n in names}
+
+
+def show(name, fmt='png', style=STYLE):
+    """Image of a figure for display in a notebook (rendered first if not cached)."""
+
+    from IPython.display import Image, SVG
+
+    if fmt not in FORMATS:
+        raise ValueError(f'Formats: {FORMATS}. Got: {fmt}')
+    path = render([name], style=style)[name][fmt]
+
+    return SVG(filename=path) if fmt == 'svg' else Image(filename=path)
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Render the aux*.py figures of the decks')
+    parser.add_argument('names', nargs='*', help=f'default: all ({", ".join(FIGURES)})')
+    parser.add_argument('--force', action='store_true')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--style', default=STYLE, help='matplotlib style sheet')
+    args = parser.parse_args()
+
+    unknown = set(args.names) - set(FIGURES)
+    if unknown:
+        parser.error(f'unknown figures: {", ".join(sorted(unknown))}')
+
+    for name, out in render(args.names or None, args.force, args.workers, args.style).items():
+        print(name, *(os.path.relpath(p, HERE) for p in out.values()))
@@ -0,0 +1,85 @@
+"""
+Sequências longas de símbolos (dígitos, caracteres) com destaque por cor.
+
+Em vez de um ax.text por símbolo, cada classe de cor vira uma única PathCollection: o contorno
+de cada símbolo distinto é gerado uma vez (TextPath) e repetido nas posições de uma grade
+monoespaçada, calculadas com NumPy. O desenho é uma chamada de draw_path_collection por cor,
+feita em C pelo backend, em vez de um layout e um desenho de texto por símbolo.
+"""
+from functools import lru_cache
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.textpath import TextPath, text_to_path
+from matplotlib.transforms import Affine2D, ScaledTranslation
+import numpy as np
+
+
+@lru_cache(maxsize=1024)
+def glyph(s, size, family):
+    """Contorno do símbolo s (em pontos, linha de base em y = 0)."""
+
+    return TextPath((0, 0), s, size=size, prop=FontProperties(family=family))
+
+
+@lru_cache(maxsize=64)
+def advance(size, family):
+    """Avanço horizontal de um símbolo da fonte monoespaçada (em pontos)."""
+
+    prop = FontProperties(family=family, size=size)
+    w1 = text_to_path.get_text_width_height_descent('0', prop, ismath=False)[0]
+    w11 = text_to_path.get_text_width_height_descent('0'*11, prop, ismath=False)[0]
+
+    return (w11 - w1)/10
+
+
+def highlight_sequence(ax, seq, colors=None, default='gray', x=0.01, y=0.5, width=None,
+                       fontsize=10, family='monospace', linespacing=1.2, **kw):
+    """
+    Desenha a sequência seq em ax, com os símbolos de colors ({símbolo: cor}) destacados
+    e os demais na cor default. A sequência começa em (x, y), em coordenadas de eixo, e é
+    centrada verticalmente em y.
+
+    width: no. de símbolos por linha (None: uma única linha).
+    kw: repassados às coleções (alpha, zorder...).
+
+    Retorna as coleções desenhadas (uma por cor).
+    """
+
+    seq = seq if isinstance(seq, str) else ''.join(map(str, seq))
+    chars = np.frombuffer(seq.encode('utf-32-le'), dtype='<U1')
+    n = len(chars)
+    width = width or max(n, 1)
+
+    # grade monoespaçada (em polegadas): avanço de um símbolo e altura de linha
+    dx = advance(fontsize, family)/72
+    dy = fontsize*linespacing/72
+    ext = glyph('0', fontsize, family).get_extents()
+    rows = (n - 1)//width + 1
+    i = np.arange(n)
+    offsets = np.column_stack([(i % width)*dx,
+                               ((rows - 1)/2 - i//width)*dy - (ext.y0 + ext.y1)/2/72])
+
+    fig = ax.figure
+    trans = Affine2D().scale(1/72) + fig.dpi_scale_trans # pontos -> pixels
+    offset_trans = fig.dpi_scale_trans + ScaledTranslation(x, y, ax.transAxes) # polegadas a partir de (x, y)
+
+    # classes de cor
+    classes = {}
+    for s, c in (colors or {}).items():
+        classes.setdefault(c, []).append(s)
+    colored = np.isin(chars, [s for ss in classes.values() for s in ss])
+    masks = {c: np.isin(chars, ss) for c, ss in classes.items()}
+    masks[default] = masks.get(default, np.zeros(n, bool)) | ~colored
+
+    out = []
+    for c, mask in masks.items():
+        mask &= chars != ' '
+        if not mask.any():
+            continue
+        symbols, inv = np.unique(chars[mask], return_inverse=True)
+        shapes = [glyph(s, fontsize, family) for s in symbols]
+        col = PathCollection([shapes[k] for k in inv], offsets=offsets[mask], offset_transform=offset_trans,
+                             transform=trans, facecolors=c, edgecolors='none', **kw)
+        out.append(ax.add_collection(col, autolim=False))
+
+    return out
@@ -0,0 +1,56 @@
+"""
+Benchmark: one ax.text per symbol (previous rise/aux05a) vs. one glyph PathCollection per color
+(rise/seqtext.highlight_sequence). Times building the figure and drawing it with Agg.
+
+Usage:
+    python bench_aux05a.py [n_symbols ...]
+"""
+import os, sys, time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'rise'))
+from seqtext import highlight_sequence
+
+WIDTH = 80 # symbols per line
+
+
+def per_symbol(text, ax):
+    """Previous approach: one text artist per symbol and row, positioned by hand."""
+
+    dx, dy = 1/WIDTH, 1/(len(text)//WIDTH + 1)
+    for i, si in enumerate(text):
+        x, y = 0.01 + (i % WIDTH)*dx, 1 - (i // WIDTH + 0.5)*dy
+        ax[0].text(x=x, y=y, s=si, fontsize=10, va='center', color='gray')
+        ax[1].text(x=x, y=y, s=si, fontsize=10, va='center', color='r' if si == '5' else 'gray')
+
+
+def batched(text, ax):
+    highlight_sequence(ax[0], text, fontsize=10, width=WIDTH)
+    highlight_sequence(ax[1], text, {'5': 'r'}, fontsize=10, width=WIDTH)
+
+
+def timeit(draw, text):
+    t = time.perf_counter()
+    fig, ax = plt.subplots(2, 1, figsize=(8, 0.2*(len(text)//WIDTH + 1)))
+    for a in ax:
+        a.axis('off')
+    draw(text, ax)
+    fig.canvas.draw()
+    plt.close(fig)
+
+    return time.perf_counter() - t
+
+
+if __name__ == '__main__':
+
+    sizes = [int(n) for n in sys.argv[1:]] or [80, 1000, 10000]
+    rng = np.random.default_rng(10)
+
+    print(f'{"symbols":>8} {"per symbol (s)":>15} {"batched (s)":>12} {"speedup":>8}')
+    for n in sizes:
+        text = ''.join(rng.integers(0, 9, n).astype(str))
+        t0, t1 = timeit(per_symbol, text), timeit(batched, text)
+        print(f'{n:>8} {t0:>15.3f} {t1:>12.3f} {t0/t1:>7.0f}x')
@@ -0,0 +1,71 @@
+"""
+Benchmark: loop-based vs. vectorized parsing of the RFB repasse table (dcs27).
+
+Usage:
+    python bench_dcs27.py [n_rows]
+"""
+import os, sys, time, tempfile
+import numpy as np
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import dcs27
+
+
+def synthetic(n: int, path: str):
+    """Write a synthetic repasse file with n rows in the RFB layout."""
+
+    rng = np.random.default_rng(0)
+    months = np.array(list(dcs27.MESES))
+    years = np.array([f'{y:02d}' for y in range(5, 25)])
+    entities = np.array(['INCRA', 'SENAI', 'SESI', 'SENAC', 'SESC', 'SEBRAE', 'ABDI', 'APEX'])
+    values = rng.uniform(1e3, 1e8, n)
+
+    pd.DataFrame({'Mês / Ano de Referência': np.char.add(np.char.add(rng.choice(months, n), '/'), rng.choice(years, n)),
+                  'Entidade': rng.choice(entities, n),
+                  'Total Repassado': [f'{v:,.2f}'.replace(',', '_').replace('.', ',').replace('_', '.') for v in values]}
+                 ).to_csv(path, sep=';', index=False)
+
+
+def transform_loop(df_o):
+    """Previous transform: Python loops over rows (plus per-row 'Período' as in plot_ts_rfb)."""
+
+    df = df_o.copy()
+    m, y = [], []
+    for i in df['Mês / Ano de Referência'].str.split('/'):
+        m.append(i[0])
+        y.append('20' + i[1])
+    df['Mês'] = m
+    df['Ano'] = y
+    df['Total Repassado'] = df['Total Repassado'].str.replace('.','',regex=False).str.replace(',','.',regex=False).apply(lambda x: float(x))
+    df = df.drop('Mês / Ano de Referência',axis=1)
+    df = df[['Mês','Ano','Entidade','Total Repassado']]
+    df['Período'] = pd.Series([v['Mês'] + '/' + v['Ano'] for i,v in df.iterrows()])
+    df['Período'] = pd.to_datetime(df['Período'].apply(lambda x: dcs27.map_my(x)))
+
+    return df
+
+
+def timeit(f, *args):
+    t = time.perf_counter()
+    out = f(*args)
+    return out, time.perf_counter() - t
+
+
+if __name__ == '__main__':
+
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'repasse-s.csv')
+        synthetic(n, path)
+        df_o = pd.read_csv(path, sep=';')
+
+    new, t_new = timeit(dcs27.transform, df_o)
+    old, t_old = timeit(transform_loop, df_o)
+
+    assert (new[old.columns].reset_index(drop=True) == old).all().all()
+
+    print(f'rows: {n:,}')
+    print(f'loop:       {t_old:8.2f} s')
+    print(f'vectorized: {t_new:8.2f} s  ({t_old / t_new:.0f}x)')
@@ -0,0 +1,47 @@
+"""
+Benchmark: point-in-polygon of random points over the ANP fields, one shapely point per row
+queried against the STRtree (predicate 'intersects') vs. geodata.locate on coordinate arrays.
+
+Usage:
+    python bench_locate.py [n_points ...]
+"""
+import os, sys, time
+import numpy as np
+import shapely
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import geodata
+
+LAYER = 'campos'
+
+
+def per_point(x, y):
+    """Point geometries built and queried one tree query per batch; first match wins."""
+
+    _, tree = geodata.tree(LAYER)
+    i, p = tree.query(shapely.points(x, y), predicate='intersects')
+    out = np.full(len(x), -1)
+    out[i[::-1]] = p[::-1]
+
+    return out
+
+
+def timeit(f, *args):
+    t = time.perf_counter()
+    out = f(*args)
+
+    return time.perf_counter() - t, out
+
+
+if __name__ == '__main__':
+
+    sizes = [int(n) for n in sys.argv[1:]] or [10_000, 1_000_000, 10_000_000]
+    rng = np.random.default_rng(0)
+    geodata.tree(LAYER) # conversion and tree out of the timings
+
+    print(f'{"points":>10} {"points + tree (s)":>18} {"locate (s)":>11} {"speedup":>8} {"inside":>8}')
+    for n in sizes:
+        x, y = rng.uniform(-41, -35, n), rng.uniform(-14, -3, n)
+        t0, _ = timeit(per_point, x, y)
+        t1, found = timeit(geodata.locate, LAYER, x, y)
+        print(f'{n:>10} {t0:>18.3f} {t1:>11.3f} {t0/t1:>7.1f}x {(found >= 0).sum():>8}')
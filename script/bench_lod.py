@@ -0,0 +1,39 @@
+"""
+Benchmark: plotting a long random walk with every point vs. reduced to the axes resolution
+(dcs/lod.py, LTTB and min/max). Times building the line and drawing it with Agg.
+
+Usage:
+    python bench_lod.py [n_points ...]
+"""
+import os, sys, time
+import numpy as np
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import lod
+
+
+def timeit(x, y, method=None):
+    t = time.perf_counter()
+    fig, ax = plt.subplots(figsize=(12, 3))
+    if method:
+        x, y = lod.downsample(x, y, method=method, ax=ax)
+    ax.plot(x, y, lw=0.8)
+    fig.canvas.draw()
+    plt.close(fig)
+
+    return time.perf_counter() - t
+
+
+if __name__ == '__main__':
+
+    sizes = [int(n) for n in sys.argv[1:]] or [100_000, 1_000_000, 10_000_000]
+    rng = np.random.default_rng(0)
+
+    print(f'{"points":>10} {"raw (s)":>9} {"lttb (s)":>9} {"minmax (s)":>11}')
+    for n in sizes:
+        x, y = np.arange(n), np.cumsum(rng.normal(size=n))
+        t0, t1, t2 = timeit(x, y), timeit(x, y, 'lttb'), timeit(x, y, 'minmax')
+        print(f'{n:>10} {t0:>9.3f} {t1:>9.3f} {t2:>11.3f}')
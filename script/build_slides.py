@@ -0,0 +1,129 @@
+"""
+Build the RISE slide decks (rise/*.ipynb -> rise/*.slides.html).
+
+Notebooks are converted in parallel worker processes, each keeping one warm SlidesExporter
+(templates loaded once per worker, not once per deck). Decks whose notebook, exporter
+options and nbconvert version hash the same as in the last build are skipped. Notebooks
+are not executed, so no kernel is started (as with `jupyter nbconvert --to slides`).
+
+Usage:
+    python build_slides.py                                   # every deck in rise/
+    python build_slides.py ../rise/02-estetica-rise.ipynb    # some decks
+    python build_slides.py --force --serve                   # rebuild all, then serve rise/
+"""
+import argparse, functools, hashlib, http.server, json, os, time
+from concurrent.futures import ProcessPoolExecutor
+from importlib.metadata import version
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RISE = os.path.join(ROOT, 'rise')
+STATE = os.path.join(RISE, '.slides-build.json')
+
+# same as --no-input --no-prompt
+OPTIONS = {'exclude_input': True, 'exclude_input_prompt': True, 'exclude_output_prompt': True}
+
+# below this no. of decks to build, converting in-process beats starting a pool
+MIN_PARALLEL = 2
+
+_exporter = None
+
+
+def exporter():
+    """SlidesExporter of this process, created once."""
+
+    global _exporter
+    if _exporter is None:
+        from nbconvert import SlidesExporter # imported only when something is built
+        _exporter = SlidesExporter(**OPTIONS)
+
+    return _exporter
+
+
+def output(path):
+    return os.path.splitext(path)[0] + '.slides.html'
+
+
+def fingerprint(path):
+    """Hash of the notebook, the exporter options and the nbconvert version."""
+
+    h = hashlib.sha1(json.dumps([OPTIONS, version('nbconvert')], sort_keys=True).encode())
+    with open(path, 'rb') as f:
+        h.update(f.read())
+
+    return h.hexdigest()
+
+
+def convert(path):
+    """Convert one notebook with the warm exporter; returns (path, seconds)."""
+
+    t = time.perf_counter()
+    body, _ = exporter().from_filename(path)
+    with open(output(path) + '.part', 'w', encoding='utf-8') as f:
+        f.write(body)
+    os.replace(output(path) + '.part', output(path))
+
+    return path, time.perf_counter() - t
+
+
+def load_state(path=STATE):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def build(paths, force=False, workers=None, state_path=STATE):
+    """Convert the notebooks that changed since the last build. Returns the converted paths."""
+
+    state = load_state(state_path)
+    keys = {p: fingerprint(p) for p in paths}
+    stale = [p for p in paths if force or state.get(os.path.relpath(p, ROOT)) != keys[p] or not os.path.isfile(output(p))]
+
+    if len(stale) >= MIN_PARALLEL:
+        with ProcessPoolExecutor(min(workers or os.cpu_count() or 1, len(stale))) as pool:
+            done = list(pool.map(convert, stale))
+    else:
+        done = [convert(p) for p in stale]
+
+    for p, dt in done:
+        state[os.path.relpath(p, ROOT)] = keys[p]
+        print(f'{os.path.relpath(output(p), ROOT)} ({dt:.1f} s)')
+
+    with open(state_path + '.part', 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(state_path + '.part', state_path)
+
+    print(f'{len(done)} of {len(paths)} decks built')
+
+    return stale
+
+
+def serve(directory=RISE, port=8000):
+    """Serve the decks over HTTP (what --post serve did for a single deck)."""
+
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    with http.server.ThreadingHTTPServer(('127.0.0.1', port), handler) as httpd:
+        print(f'Serving {directory} at http://127.0.0.1:{port}/ (Ctrl+C to stop)')
+        try:
+            httpd.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Build the RISE slide decks')
+    parser.add_argument('notebooks', nargs='*', help='default: every notebook in rise/')
+    parser.add_argument('--force', action='store_true', help='rebuild even if unchanged')
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--serve', action='store_true', help='serve rise/ after building')
+    parser.add_argument('--port', type=int, default=8000)
+    args = parser.parse_args()
+
+    paths = [os.path.abspath(p) for p in args.notebooks] or \
+            sorted(os.path.join(RISE, f) for f in os.listdir(RISE) if f.endswith('.ipynb'))
+    build(paths, args.force, args.workers)
+
+    if args.serve:
+        serve(port=args.port)
@@ -1,15 +1,234 @@
-import json
+"""
+Outline (table of contents) of the book's notebooks.
+
+Walks ipynb/ and rise/, extracts the markdown headings of every notebook and writes one
+combined TOC. Each notebook is read whole into one string, then scanned with a small JSON
+reader that decodes only `cell_type` and `source` and skips everything else (outputs with
+base64 images, metadata) without decoding it or building Python objects for it. Outlines are cached by mtime/size and content
+hash, and changed notebooks are parsed in parallel worker processes.
+
+Usage:
+    python extract_outline.py                     # ipynb/ and rise/ -> script/outline.md
+    python extract_outline.py ../rise -o toc.md   # other folders / output
+"""
+import argparse, hashlib, json, os, re
+from concurrent.futures import ProcessPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DIRS = [os.path.join(ROOT, 'ipynb'), os.path.join(ROOT, 'rise')]
+OUTPUT = os.path.join(ROOT, 'script', 'outline.md')
+CACHE = os.path.join(ROOT, 'script', '.outline-cache.json')
+
+# below this no. of changed notebooks, parsing in-process beats starting a pool
+MIN_PARALLEL = 4
+
+WS = re.compile(r'\s*')
+STRUCT = re.compile(r'["\[\]{}]')
+SCALAR = re.compile(r'[^,\]}\s]+')
+FENCE = re.compile(r'^\s*(```|~~~)')
+
+decoder = json.JSONDecoder()
+
+
+def skip_ws(s, i):
+    return WS.match(s, i).end()
+
+
+def skip_string(s, i):
+    """Position after the JSON string starting at s[i] (str.find, so long base64 payloads are skipped at memchr speed)."""
+
+    j = s.find('"', i + 1)
+    while s[j - 1] == '\\':
+        k = j - 1
+        while s[k] == '\\':
+            k -= 1
+        if (j - k) % 2: # even no. of backslashes: the quote is not escaped
+            break
+        j = s.find('"', j + 1)
+
+    return j + 1
+
+
+def skip_value(s, i):
+    """Position after the JSON value starting at s[i], without decoding it."""
+
+    c = s[i]
+    if c == '"':
+        return skip_string(s, i)
+    if c not in '[{':
+        return SCALAR.match(s, i).end()
+
+    depth = 0
+    while True:
+        m = STRUCT.search(s, i)
+        c = m.group()
+        if c == '"':
+            i = skip_string(s, m.start())
+            continue
+        depth += 1 if c in '[{' else -1
+        i = m.end()
+        if depth == 0:
+            return i
+
+
+def members(s, i):
+    """(key, value position) of the members of the JSON object at s[i]; the caller must consume each value
+    and send back the position after it."""
+
+    i = skip_ws(s, i + 1) # '{'
+    if s[i] == '}':
+        return
+    while True:
+        end = skip_string(s, i)
+        key = json.loads(s[i:end])
+        i = skip_ws(s, end)
+        i = skip_ws(s, i + 1) # ':'
+        i = yield key, i
+        i = skip_ws(s, i)
+        if s[i] == '}':
+            return
+        i = skip_ws(s, i + 1) # ','
+
+
+def walk(s, i, visit):
+    """Calls visit(key, pos) for each member of the object at s[i]; visit returns the position after the value."""
+
+    gen = members(s, i)
+    try:
+        key, pos = next(gen)
+        while True:
+            key, pos = gen.send(visit(key, pos))
+    except StopIteration:
+        pass
+
+
+def cells(s):
+    """(cell_type, source) of each cell of a notebook given as JSON text."""
+
+    out = []
+
+    def cell(key, pos):
+        if key in ('cell_type', 'source'):
+            value, end = decoder.raw_decode(s, pos)
+            current[key] = value
+            return end
+        return skip_value(s, pos)
+
+    def top(key, pos):
+        nonlocal current
+        if key != 'cells':
+            return skip_value(s, pos)
+        i = skip_ws(s, pos + 1) # '['
+        while s[i] != ']':
+            current = {}
+            walk(s, i, cell)
+            out.append((current.get('cell_type'), current.get('source', '')))
+            i = skip_ws(s, skip_value(s, i))
+            if s[i] == ',':
+                i = skip_ws(s, i + 1)
+        return i + 1
+
+    current = {}
+    walk(s, skip_ws(s, 0), top)
+
+    return out
 
-def extract_outline_from_ipynb(ipynb_path, output_path=None):
-    with open(ipynb_path, 'r', encoding='utf-8') as f:
-        notebook = json.load(f)
 
-    outline_lines = []
-    for cell in notebook['cells']:
-        if cell['cell_type'] == 'markdown':
-            for line in cell['source']:
-                if line.lstrip().startswith('#'):
-                    outline_lines.append(line.rstrip('\n'))
+def outline(path):
+    """
+    Heading lines ('# ...') of the markdown cells of a notebook, outside fenced code blocks.
+
+    The file is read whole; only cell_type and source are decoded (see cells).
+    """
+
+    with open(path, encoding='utf-8') as f:
+        s = f.read()
+
+    lines = []
+    for cell_type, source in cells(s):
+        if cell_type != 'markdown':
+            continue
+        fenced = False
+        for line in (source if isinstance(source, list) else source.splitlines(True)):
+            if FENCE.match(line):
+                fenced = not fenced
+            elif not fenced and line.lstrip().startswith('#'):
+                lines.append(line.strip())
+
+    return lines
+
+
+def digest(path):
+    with open(path, 'rb') as f:
+        return hashlib.file_digest(f, 'sha1').hexdigest()
+
+
+def notebooks(dirs):
+    return sorted(os.path.join(d, f) for d in dirs if os.path.isdir(d)
+                  for f in os.listdir(d) if f.endswith('.ipynb'))
+
+
+def load_cache(path):
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def outlines(paths, cache_path=CACHE, workers=None):
+    """{path: heading lines}, reusing cached outlines of notebooks that did not change."""
+
+    cache = load_cache(cache_path) if cache_path else {}
+    result, stale = {}, []
+
+    for p in paths:
+        st = os.stat(p)
+        entry = cache.get(p)
+        if entry and (entry['mtime'], entry['size']) == (st.st_mtime, st.st_size):
+            result[p] = entry['outline']
+            continue
+        h = digest(p)
+        if entry and entry['sha1'] == h: # touched, not changed
+            entry['mtime'], entry['size'] = st.st_mtime, st.st_size
+            result[p] = entry['outline']
+            continue
+        stale.append((p, st, h))
+
+    if len(stale) >= MIN_PARALLEL:
+        with ProcessPoolExecutor(workers) as pool:
+            parsed = list(pool.map(outline, [p for p, _, _ in stale]))
+    else:
+        parsed = [outline(p) for p, _, _ in stale]
+
+    for (p, st, h), lines in zip(stale, parsed):
+        cache[p] = {'mtime': st.st_mtime, 'size': st.st_size, 'sha1': h, 'outline': lines}
+        result[p] = lines
+
+    if cache_path:
+        with open(cache_path + '.part', 'w', encoding='utf-8') as f:
+            json.dump({p: cache[p] for p in paths}, f, ensure_ascii=False)
+        os.replace(cache_path + '.part', cache_path)
+
+    return result
+
+
+def toc(result, root=ROOT):
+    """Combined TOC in markdown: one section per notebook, headings as a nested list."""
+
+    out = []
+    for p, lines in result.items():
+        out.append(f'## {os.path.relpath(p, root)}\n')
+        for line in lines:
+            level = len(line) - len(line.lstrip('#'))
+            out.append('  '*(level - 1) + '- ' + line[level:].strip())
+        out.append('')
+
+    return '\n'.join(out)
+
+
+def extract_outline_from_ipynb(ipynb_path, output_path=None):
+    outline_lines = outline(ipynb_path)
 
     if output_path:
         with open(output_path, 'w', encoding='utf-8') as f_out:
@@ -20,6 +239,17 @@ def extract_outline_from_ipynb(ipynb_path, output_path=None):
         print('\n'.join(outline_lines))
 
 
-# Usage:
-file = "../ipynb/aula-01a-introducao.ipynb"
-extract_outline_from_ipynb(file, 'outline.txt')
\ No newline at end of file
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(description='Combined outline of the notebooks')
+    parser.add_argument('dirs', nargs='*', default=DIRS)
+    parser.add_argument('-o', '--output', default=OUTPUT)
+    parser.add_argument('--cache', default=CACHE, help="cache file ('' to disable)")
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    paths = notebooks([os.path.abspath(d) for d in args.dirs])
+    with open(args.output, 'w', encoding='utf-8') as f:
+        f.write(toc(outlines(paths, args.cache or None, args.workers)))
+
+    print(f"Outline of {len(paths)} notebooks saved to {args.output}")
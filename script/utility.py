@@ -1,5 +1,234 @@
-from selenium import webdriver
-from selenium.webdriver.common.by import By
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from pathlib import Path
+from lxml import etree, html
+import os, queue, threading
+import pandas as pd
+import requests
+
+try:
+    from selenium import webdriver
+    from selenium.webdriver.support.ui import WebDriverWait
+    from selenium.common.exceptions import TimeoutException
+except ImportError: # only the static engine is available
+    webdriver = None
+
+# sent by the static engine; some sites refuse the default python-requests agent
+HEADERS = {"User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"}
+
+ENGINES = ("auto", "static", "browser")
+
+# resolves every XPath in a single pass over the DOM; tables also come back as rows of cell texts
+EXTRACT_JS = """
+const out = {};
+for (const xp of arguments[0]) {
+    let node;
+    try {
+        node = document.evaluate(xp, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null).singleNodeValue;
+    } catch (e) {
+        out[xp] = {error: String(e)};
+        continue;
+    }
+    if (!node) {
+        out[xp] = {error: 'no match'};
+        continue;
+    }
+    const table = node.tagName === 'TABLE' ? node : (node.querySelector ? node.querySelector('table') : null);
+    out[xp] = {
+        text: (node.innerText !== undefined ? node.innerText : node.textContent).trim(),
+        table: table ? Array.from(table.rows, r => Array.from(r.cells, c => c.innerText.trim())) : null
+    };
+}
+return out;
+"""
+
+
+def as_url(url: str):
+    """URL as given, or a file:// URI if it is a local path (e.g. a saved static HTML page)."""
+
+    return Path(url).resolve().as_uri() if os.path.exists(url) else url
+
+
+@lru_cache(maxsize=256)
+def compiled(xpath: str):
+    """Compiled XPath evaluator, cached across calls."""
+
+    return etree.XPath(xpath)
+
+
+def table_rows(table):
+    """Rows of cell texts of an lxml <table> element (nested tables excluded)."""
+
+    return [[" ".join(c.text_content().split()) for c in tr.xpath("./th|./td")]
+            for tr in table.xpath("./tr|./thead/tr|./tbody/tr|./tfoot/tr")]
+
+
+def table_frame(entry):
+    """DataFrame of the table of a scrape result entry (first row as header), or None."""
+
+    rows = entry.get("table")
+    if not rows:
+        return None
+
+    return pd.DataFrame(rows[1:], columns=rows[0])
+
+
+def static_scrape(url: str, xpaths: list, session=None, timeout=10):
+    """
+    Extracts the given XPaths from the server-rendered HTML of a page, without a browser.
+
+    Returns:
+    - dict: same format as BrowserPool.scrape; XPaths without a match carry {'error': 'no match'}.
+    """
+    try:
+        if os.path.exists(url):
+            with open(url, "rb") as f:
+                content = f.read()
+        else:
+            r = (session or requests).get(url, headers=HEADERS, timeout=timeout)
+            r.raise_for_status()
+            content = r.content
+        tree = html.fromstring(content)
+    except Exception as e:
+        return {xp: {"error": str(e)} for xp in xpaths}
+
+    results = {}
+    for xp in xpaths:
+        try:
+            found = compiled(xp)(tree)
+        except etree.XPathError as e:
+            results[xp] = {"error": str(e)}
+            continue
+        if not isinstance(found, list) or not found:
+            results[xp] = {"error": "no match"} if not found else {"text": str(found), "table": None}
+            continue
+
+        node = found[0]
+        if not isinstance(node, etree._Element):
+            results[xp] = {"text": str(node).strip(), "table": None}
+            continue
+        table = node if node.tag == "table" else next(node.iter("table"), None)
+        results[xp] = {"text": " ".join(" ".join(node.itertext()).split()),
+                       "table": table_rows(table) if table is not None else None}
+
+    return results
+
+
+def unmatched(results):
+    """XPaths of a scrape result that did not match."""
+
+    return [xp for xp, r in results.items() if "error" in r]
+
+
+class BrowserPool:
+    """
+    Pool of WebDriver sessions reused across pages.
+
+    Drivers are started on demand (up to `size`) and handed to one page at a time, so a batch
+    of URLs is scraped concurrently without paying browser startup for every page.
+
+    Usage:
+        with BrowserPool(size=4) as pool:
+            data = pool.scrape_many(urls, xpaths)
+    """
+
+    def __init__(self, size=4, browser_type="chrome", wait_time=10):
+        if webdriver is None:
+            raise ImportError("selenium is required for the browser engine")
+        self.size = size if browser_type == "chrome" else 1 # safaridriver allows a single session
+        self.browser_type = browser_type
+        self.wait_time = wait_time
+        self._idle = queue.Queue()
+        self._drivers = []
+        self._lock = threading.Lock()
+
+    def _new_driver(self):
+        if self.browser_type == "safari":
+            return webdriver.Safari()
+
+        options = webdriver.ChromeOptions()
+        options.add_argument("--headless=new")
+        options.add_argument("--disable-gpu")
+        options.add_argument("--no-sandbox")
+        options.add_argument("--disable-dev-shm-usage")
+        options.page_load_strategy = "eager" # DOM ready is enough; don't wait for images/ads
+
+        return webdriver.Chrome(options=options)
+
+    def acquire(self):
+        """An idle driver, or a new one while the pool is below its size (blocks otherwise)."""
+
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if len(self._drivers) < self.size:
+                driver = self._new_driver()
+                self._drivers.append(driver)
+                return driver
+
+        return self._idle.get()
+
+    def release(self, driver):
+        self._idle.put(driver)
+
+    def close(self):
+        """Quit every driver of the pool."""
+
+        for driver in self._drivers:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        self._drivers.clear()
+        self._idle = queue.Queue()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def scrape(self, url: str, xpaths: list, wait_time=None):
+        """
+        Extracts the given XPaths from one page.
+
+        Waits up to wait_time seconds for every XPath to match, evaluating all of them in one
+        script call per attempt.
+
+        Returns:
+        - dict: {xpath: {'text': str, 'table': list of rows or None}} or {xpath: {'error': str}}.
+        """
+        wait_time = self.wait_time if wait_time is None else wait_time
+        driver = self.acquire()
+        last = {}
+
+        def matched(d):
+            last.update(d.execute_script(EXTRACT_JS, xpaths))
+            return all('error' not in last[xp] for xp in xpaths)
+
+        try:
+            driver.get(as_url(url))
+            WebDriverWait(driver, wait_time, poll_frequency=0.25).until(matched)
+        except TimeoutException:
+            pass # keep what matched; the rest carry their error
+        except Exception as e:
+            last = {xp: {'error': str(e)} for xp in xpaths}
+        finally:
+            self.release(driver)
+
+        return {xp: last.get(xp, {'error': 'timeout'}) for xp in xpaths}
+
+    def scrape_many(self, urls: list, xpaths: list, wait_time=None):
+        """Scrapes a batch of URLs concurrently (at most `size` pages at a time). Returns {url: results}."""
+
+        with ThreadPoolExecutor(self.size) as pool:
+            results = pool.map(lambda url: self.scrape(url, xpaths, wait_time), urls)
+
+            return dict(zip(urls, results))
+
 
 class Utility:
     """
@@ -7,58 +236,95 @@ class Utility:
     """
 
     @staticmethod
-    def scrape_data(url: str, xpaths: list, browser_type="safari", wait_time=10):
+    def scrape_data(url: str, xpaths: list, browser_type="safari", wait_time=10, engine="auto"):
         """
         Scrapes data from a webpage using the given list of XPaths.
 
         Parameters:
-        - url (str): The webpage URL.
+        - url (str): The webpage URL (or path to a local HTML file).
         - xpaths (list): A list of XPath selectors.
         - browser_type (str): The browser to use ('safari' or 'chrome'). Default is 'safari'.
-        - wait_time (int): The implicit wait time for elements to load. Default is 10 seconds.
+        - wait_time (int): Max. time to wait for the XPaths to match. Default is 10 seconds.
+        - engine (str): 'static' (plain HTTP fetch parsed with lxml), 'browser' (Selenium) or
+                        'auto' (static first, browser only for the XPaths that didn't match). Default is 'auto'.
 
         Returns:
-        - dict: A dictionary containing extracted texts or errors for each XPath.
+        - dict: For each XPath, {'text': ..., 'table': ...} (table rows when the match is or
+                contains a <table>; see table_frame) or {'error': ...}.
         """
-        # Decide which WebDriver to use
-        if browser_type == "safari":
-            browser = webdriver.Safari()
-        else:
-            options = webdriver.ChromeOptions()
-            options.add_argument("--headless")  # Run without opening the browser (optional)
-            browser = webdriver.Chrome(options=options)    
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
 
-        print(f"Using {browser_type.capitalize()} browser...")
+        results = static_scrape(url, xpaths, timeout=wait_time) if engine != "browser" else {xp: {"error": "not fetched"} for xp in xpaths}
+        missing = unmatched(results) if engine != "static" else []
 
-        results = {}
+        if missing:
+            print(f"Using {browser_type.capitalize()} browser...")
+            with BrowserPool(1, browser_type, wait_time) as pool:
+                results.update(pool.scrape(url, missing))
 
-        try:
-            browser.get(url)                
-            browser.implicitly_wait(wait_time)
-
-            for i, xpath in enumerate(xpaths, start=1):
-                try:
-                    element = browser.find_element(By.XPATH, xpath)
-                    results[xpath] = element#.text
-                    print(f"XPath {i}: {xpath} -> Text: {element.text}")
-                except Exception as e:
-                    results[xpath] = f"Error: {e}"
-                    print(f"XPath {i}: {xpath} -> Error: {e}")
+        for i, xpath in enumerate(xpaths, start=1):
+            r = results[xpath]
+            print(f"XPath {i}: {xpath} -> " + (f"Error: {r['error']}" if 'error' in r else f"Text: {r['text'][:80]}"))
 
-        except Exception as e:
-            print(f"General Error: {e}")
-        
-        finally:
-            browser.quit()
-        
         return results
-    
 
-# # execução    
+    @staticmethod
+    def scrape_many(urls: list, xpaths: list, max_workers=4, wait_time=10, engine="auto"):
+        """
+        Scrapes the same XPaths from many pages: concurrent static fetches and/or a pool of
+        headless Chrome sessions (see scrape_data for the engines).
+
+        Parameters:
+        - urls (list): Webpage URLs (or paths to local HTML files).
+        - xpaths (list): A list of XPath selectors.
+        - max_workers (int): Number of concurrent fetches / browser sessions. Default is 4.
+        - wait_time (int): Max. time to wait for each page.
+        - engine (str): 'auto', 'static' or 'browser'. Default is 'auto'.
+
+        Returns:
+        - dict: {url: {xpath: {'text': ..., 'table': ...} or {'error': ...}}}.
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"engine must be one of {ENGINES}, got {engine!r}")
+
+        if engine == "browser":
+            data = {url: {xp: {"error": "not fetched"} for xp in xpaths} for url in urls}
+        else:
+            with requests.Session() as s, ThreadPoolExecutor(max_workers) as pool:
+                data = dict(zip(urls, pool.map(lambda url: static_scrape(url, xpaths, s, wait_time), urls)))
+
+        pending = [url for url in urls if unmatched(data[url])] if engine != "static" else []
+        if pending:
+            with BrowserPool(max_workers, "chrome", wait_time) as pool:
+                for url, results in pool.scrape_many(pending, xpaths).items():
+                    data[url].update({xp: results[xp] for xp in unmatched(data[url])})
+
+        return data
+
+    @staticmethod
+    def scrape_tables(url: str, xpaths: list, engine="auto", **kwargs):
+        """Like scrape_data, but returns {xpath: DataFrame} for the XPaths that match a table."""
+
+        results = Utility.scrape_data(url, xpaths, engine=engine, **kwargs)
+
+        return {xp: table_frame(r) for xp, r in results.items() if r.get("table")}
+
+
+# # execução
 # import os, sys; sys.path.append(os.path.abspath("../script"))
 # import utility as util  # Importing utility.py as util
+# import pandas as pd
 
 
 # url = "https://www.boxofficemojo.com/year/world/?ref_=bo_nb_bns_tab"
 # xpaths = ["//*[@id=\"table\"]/div/table[1]"]
-# data = util.Utility.scrape_data(url, xpaths, browser_type="safari", wait_time=10)
\ No newline at end of file
+# data = util.Utility.scrape_data(url, xpaths, browser_type="safari", wait_time=10)
+# df = util.table_frame(data[xpaths[0]])
+
+# # páginas renderizadas no servidor: sem navegador
+# tables = util.Utility.scrape_tables(url, xpaths, engine="static")
+
+# # vários anos, 4 sessões de Chrome em paralelo
+# urls = [f"https://www.boxofficemojo.com/year/world/{y}/" for y in range(2000, 2025)]
+# data = util.Utility.scrape_many(urls, xpaths, max_workers=4)
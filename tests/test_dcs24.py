@@ -0,0 +1,79 @@
+import os, sys
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import dcs24
+
+
+def trade(columns, n=20):
+    """Small import/export table with the columns of one flow."""
+
+    values = [2020, 1, 1234, 10, 5, 'PB', 1, 1, 1, 2, 100, 0, 0]
+    df = pd.DataFrame([values]*n, columns=columns)
+    df['Mês'] = [1 + i % 12 for i in range(n)]
+
+    return df
+
+
+def cache(path):
+    """Parquet cache of a year written to path."""
+
+    dcs24.write_table(trade(dcs24.IMP_COLUMNS), os.path.join(path, 'imports.parquet'), dcs24.SORT_KEYS['imp'])
+    dcs24.write_table(trade(dcs24.EXP_COLUMNS), os.path.join(path, 'exports.parquet'), dcs24.SORT_KEYS['exp'])
+    dcs24.write_table(pd.DataFrame([[5, 'Brasil', 'América do Sul']], columns=dcs24.CC_COLUMNS),
+                      os.path.join(path, 'country-codes.parquet'))
+    dcs24.write_table(pd.DataFrame([[1, 'MARITIMA']], columns=dcs24.VIA_COLUMNS), os.path.join(path, 'via-codes.parquet'))
+
+
+def test_load_files_flow_columns(tmp_path):
+    cache(tmp_path)
+    imp, exp, *_ = dcs24.load_files(2020, str(tmp_path),
+                                    columns={'imp': ['Mês', 'País de origem'], 'exp': ['Mês', 'País de destino']},
+                                    filters={'imp': [('Mês', '<=', 6)]})
+
+    assert list(imp.columns) == ['Mês', 'País de origem']
+    assert list(exp.columns) == ['Mês', 'País de destino']
+    assert imp['Mês'].max() == 6 and exp['Mês'].max() == 12
+
+
+def test_load_files_shared_columns(tmp_path):
+    cache(tmp_path)
+    imp, exp, *_ = dcs24.load_files(2020, str(tmp_path), columns=['Mês', 'NCM'], filters=[('Mês', '=', 3)])
+
+    assert list(imp.columns) == list(exp.columns) == ['Mês', 'NCM']
+    assert set(imp['Mês']) == set(exp['Mês']) == {3}
+
+
+def test_stream_table_new_categories(tmp_path):
+    # the first chunk has one country and one state, later chunks hundreds of new ones
+    n = 1000
+    raw = trade(dcs24.IMP_COLUMNS, n)
+    raw['País de origem'] = [5]*100 + [i % 400 for i in range(n - 100)]
+    raw['UF de destino'] = ['PB']*100 + [f'U{i % 300:03d}' for i in range(n - 100)]
+    raw['Mês'] = [12 - i % 12 for i in range(n)]
+    src, file = tmp_path / 'IMP_2020.csv', str(tmp_path / 'imports.parquet')
+    raw.to_csv(src, sep=';', index=False)
+
+    dcs24.stream_table(src, file, dcs24.IMP_COLUMNS, chunksize=100, sort_by=dcs24.SORT_KEYS['imp'])
+    df = dcs24.set_dtypes(pd.read_parquet(file))
+
+    assert sorted(os.listdir(tmp_path)) == ['IMP_2020.csv', 'imports.parquet']
+    assert len(df) == n
+    assert df['País de origem'].nunique() == 400 and df['UF de destino'].nunique() == 301
+    keys = df[['Mês', 'UF de destino']].astype({'UF de destino': str})
+    assert keys.equals(keys.sort_values(['Mês', 'UF de destino'], ignore_index=True))
+
+
+def test_stream_table_short_export_header(tmp_path):
+    # export files of some years have no freight/insurance columns
+    raw = trade(dcs24.EXP_COLUMNS, 30).iloc[:, :11]
+    raw.columns = ['CO_ANO', 'CO_MES', 'CO_NCM', 'CO_UNID', 'CO_PAIS', 'SG_UF_NCM', 'CO_VIA', 'CO_URF',
+                   'QT_ESTAT', 'KG_LIQUIDO', 'VL_FOB']
+    src, file = tmp_path / 'EXP_2020.csv', str(tmp_path / 'exports.parquet')
+    raw.to_csv(src, sep=';', index=False)
+
+    dcs24.stream_table(src, file, dcs24.EXP_COLUMNS, chunksize=7, sort_by=dcs24.SORT_KEYS['exp'])
+    df = pd.read_parquet(file)
+
+    assert list(df.columns) == dcs24.EXP_COLUMNS[:11]
+    assert len(df) == 30 and df['Valor Free On Board'].sum() == 3000
@@ -0,0 +1,76 @@
+import asyncio, glob, json, os, sys, time
+from datetime import date
+from aiohttp import web
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import dcs24_v2
+
+# consulta com o mesmo formato de filtro (ano em yearEnd) da API, servida localmente
+URL = ('http://127.0.0.1:{port}/general?filter=%7B%22yearEnd%22:%22{{year}}%22,%22typeForm%22:{{tipo}},'
+       '%22uf%22:%22{{id_estado}}%22,%22mes%22:%22{{mes_num}}%22,%22nome%22:%22{{mes}}%22%7D')
+
+
+class States:
+    text = json.dumps([{'id': 25}])
+
+
+async def crawl(tmp_path, year, monkeypatch):
+    """Importação de um ano contra um servidor local; retorna as requisições feitas e as respostas 304."""
+
+    seen = {'get': 0, '304': 0}
+
+    async def general(request):
+        seen['get'] += 1
+        if request.headers.get('If-None-Match') == '"v1"':
+            seen['304'] += 1
+            return web.Response(status=304)
+        return web.json_response({'data': {'list': [{'vlFob': 1}]}}, headers={'ETag': '"v1"'})
+
+    app = web.Application()
+    app.router.add_get('/general', general)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    monkeypatch.setattr(dcs24_v2, 'GERAL_URL', URL.format(port=port))
+    monkeypatch.setattr(dcs24_v2.requests, 'get', lambda url: States)
+    try:
+        exp, imp = await dcs24_v2.import_comex_data(year, str(tmp_path / 'sink'), cache=str(tmp_path / 'cache'))
+    finally:
+        await runner.cleanup()
+
+    assert len(exp) == len(imp) == 12
+    return seen
+
+
+def test_current_year_pages_revalidated(tmp_path, monkeypatch):
+    year = date.today().year
+    run = lambda: asyncio.run(crawl(tmp_path, year, monkeypatch))
+
+    assert run() == {'get': 24, '304': 0}
+    assert run() == {'get': 0, '304': 0} # dentro da validade: servidas do cache
+
+    # validade vencida: as páginas do ano corrente são revalidadas e o 304 renova as entradas
+    old = time.time() - dcs24_v2.CACHE_TTL - 1
+    metas = glob.glob(str(tmp_path / 'cache' / '*.meta'))
+    for m in metas:
+        with open(m) as f:
+            meta = json.load(f)
+        meta['stored'] = old
+        with open(m, 'w') as f:
+            json.dump(meta, f)
+
+    assert run() == {'get': 24, '304': 24}
+    for m in metas:
+        with open(m) as f:
+            assert json.load(f)['stored'] > old + dcs24_v2.CACHE_TTL
+
+
+def test_closed_year_pages_done(tmp_path, monkeypatch):
+    year = date.today().year - 1
+    run = lambda: asyncio.run(crawl(tmp_path, year, monkeypatch))
+
+    assert run() == {'get': 24, '304': 0}
+    assert run() == {'get': 0, '304': 0}
@@ -0,0 +1,37 @@
+import os, sys
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dcs'))
+import dcs27
+
+
+def frame(entities, n):
+    return pd.DataFrame({'Entidade': np.repeat(entities, n), 'Total Repassado': np.arange(len(entities)*n, dtype=float),
+                         'Período': np.tile(pd.date_range('2000-01', periods=n, freq='MS'), len(entities))})
+
+
+def test_entity_index_empty():
+    ix = dcs27.EntityIndex(frame([], 0))
+
+    assert len(ix) == 0 and 'A' not in ix
+
+
+def test_plot_many_empty():
+    fig, ax = plt.subplots()
+
+    assert dcs27.plot_ts_rfb_many(dcs27.EntityIndex(frame(['A'], 3)), [], ax, []) is ax
+    assert not ax.lines
+    plt.close(fig)
+
+
+def test_plot_many_one_call():
+    fig, ax = plt.subplots()
+    dcs27.plot_ts_rfb_many(dcs27.EntityIndex(frame(['A', 'B'], 50)), ['A', 'B'], ax, ['r', 'b'])
+
+    assert [t.get_text() for t in ax.get_legend().texts] == ['A', 'B']
+    assert [len(line.get_xdata()) for line in ax.lines if len(line.get_xdata())] == [50, 50]
+    plt.close(fig)
@@ -0,0 +1,42 @@
+import os, sys
+
+sys.path.insert(1, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'dw'))
+import dw1b
+
+
+def test_row_order_desc_keeps_ties():
+    sort_by = (('Arma branca', 'desc'), ('Bairros', 'asc'))
+    rows = dw1b.df.iloc[dw1b.row_order('', sort_by)]
+
+    assert rows.equals(dw1b.df.sort_values(['Arma branca', 'Bairros'], ascending=[False, True], kind='stable'))
+
+
+def test_row_order_asc_desc_pairs():
+    for first in ('asc', 'desc'):
+        for second in ('asc', 'desc'):
+            rows = dw1b.row_order('', (('Outros', first), ('Bairros', second)))
+            expected = dw1b.df.sort_values(['Outros', 'Bairros'], ascending=[first == 'asc', second == 'asc'],
+                                           kind='stable')
+            assert (rows == expected.index.to_numpy()).all()
+
+
+def test_row_order_ignores_mistyped_comparison():
+    assert len(dw1b.row_order('{Bairros} > 3', ())) == len(dw1b.df)
+    assert len(dw1b.row_order('{Outros} > abc', ())) == len(dw1b.df)
+
+    data, pages = dw1b.update_table(0, 6, [], '{Bairros} > 3')
+    assert len(data) == 6
+
+
+def test_row_order_compares_in_column_type():
+    rows = dw1b.df.iloc[dw1b.row_order('{Arma de fogo} >= 40 && {Bairros} > "M"', ())]
+
+    assert len(rows) and (rows['Arma de fogo'] >= 40).all() and (rows['Bairros'] > 'M').all()
+
+
+def test_parse_filter_column_first():
+    assert dw1b.parse_filter('{a<b} >= 3') == ('a<b', 'ge', '3')
+    assert dw1b.parse_filter('{Bairros} eq "x = ne y"') == ('Bairros', 'eq', 'x = ne y')
+    assert dw1b.parse_filter('{Bairros} contains <') == ('Bairros', 'contains', '<')
+    assert dw1b.parse_filter('{Outros} ne 0') == ('Outros', 'ne', '0')
+    assert dw1b.parse_filter('Outros > 0') == (None, None, None)